@@ -0,0 +1,260 @@
+import wave
+import struct
+import ctypes
+import threading
+import numpy as np
+import soundfile as sf
+import azure.cognitiveservices.speech as speechsdk
+
+DEFAULT_SAMPLE_RATE = 16000
+# 100 ms of 16 kHz mono audio per write
+DEFAULT_CHUNK_FRAMES = 1600
+
+
+def create_push_stream(sample_rate=DEFAULT_SAMPLE_RATE, channels=1):
+    """Create a 16-bit PCM push stream and the AudioConfig that reads from it"""
+    stream_format = speechsdk.audio.AudioStreamFormat(
+        samples_per_second=sample_rate,
+        bits_per_sample=16,
+        channels=channels
+    )
+    stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
+    return stream, speechsdk.audio.AudioConfig(stream=stream)
+
+
+def _as_write_buffer(view):
+    """Wrap a byte view so PushAudioInputStream.write reads it in place
+
+    The SDK passes the buffer straight to its native write call, which takes
+    its own copy. A ctypes array over the view avoids materializing an extra
+    bytes object; read-only views fall back to bytes().
+    """
+    if view.readonly:
+        return bytes(view)
+    return (ctypes.c_char * view.nbytes).from_buffer(view)
+
+
+def as_pcm16(pcm):
+    """Return pcm as a C-contiguous little-endian int16 array, copying only if needed"""
+    pcm = np.asarray(pcm)
+    if pcm.dtype.kind != 'i' or pcm.dtype.itemsize != 2:
+        raise ValueError(f"PCM audio must be int16, got {pcm.dtype}")
+    return np.ascontiguousarray(pcm, dtype='<i2')
+
+
+def read_pcm16(path):
+    """Read an audio file as mono int16 samples, downmixing if needed"""
+    pcm, sample_rate = sf.read(path, dtype='int16', always_2d=True)
+    if pcm.shape[1] == 1:
+        return pcm[:, 0], sample_rate
+    return pcm.mean(axis=1).astype(np.int16), sample_rate
+
+
+def write_pcm(stream, pcm, chunk_frames=DEFAULT_CHUNK_FRAMES, close=True):
+    """Write an int16 numpy buffer to a push stream in chunks"""
+    pcm = as_pcm16(pcm)
+    frame_bytes = pcm.itemsize * (pcm.shape[1] if pcm.ndim > 1 else 1)
+    data = memoryview(pcm).cast('B')
+    step = chunk_frames * frame_bytes
+    for start in range(0, data.nbytes, step):
+        stream.write(_as_write_buffer(data[start:start + step]))
+    if close:
+        stream.close()
+
+
+def read_wav_header(fileobj):
+    """Parse a WAV header and leave fileobj at the first PCM byte
+
+    Returns (sample_rate, channels, data_bytes). Only 16-bit PCM is
+    supported, matching the push stream format.
+    """
+    wav = wave.open(fileobj, 'rb')
+    if wav.getsampwidth() != 2:
+        raise ValueError("Only 16-bit PCM WAV audio is supported")
+    return wav.getframerate(), wav.getnchannels(), wav.getnframes() * wav.getnchannels() * 2
+
+
+def wav_header(data_bytes, sample_rate=DEFAULT_SAMPLE_RATE, channels=1, sample_width=2):
+    """Return the 44-byte RIFF/WAVE header for data_bytes of PCM audio"""
+    block_align = channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_bytes, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, sample_rate * block_align, block_align, sample_width * 8,
+        b'data', data_bytes
+    )
+
+
+class WavBody:
+    """A WAV file built around an int16 numpy recording, for use as an HTTP request body
+
+    Iterating yields the header followed by memoryview slices of the
+    recording itself, so the audio is never written to disk or copied into
+    a bytes object. len() gives the total size, which lets requests send a
+    Content-Length instead of a chunked body, and the body can be iterated
+    again if the request is retried.
+    """
+
+    def __init__(self, pcm, sample_rate=DEFAULT_SAMPLE_RATE, chunk_bytes=64 * 1024):
+        pcm = as_pcm16(pcm)
+        self.channels = pcm.shape[1] if pcm.ndim > 1 else 1
+        self.sample_rate = sample_rate
+        self.chunk_bytes = chunk_bytes
+        self._data = memoryview(pcm).cast('B')
+        self._header = wav_header(self._data.nbytes, sample_rate, self.channels)
+
+    @property
+    def seconds(self):
+        return self._data.nbytes / (2 * self.channels * self.sample_rate)
+
+    def __len__(self):
+        return len(self._header) + self._data.nbytes
+
+    def __iter__(self):
+        yield self._header
+        for start in range(0, self._data.nbytes, self.chunk_bytes):
+            yield self._data[start:start + self.chunk_bytes]
+
+
+def write_file(stream, fileobj, chunk_bytes=DEFAULT_CHUNK_FRAMES * 2, limit=None, close=True):
+    """Copy raw PCM from a binary file-like object into a push stream
+
+    Reads into one reusable buffer when the object supports readinto, so
+    streaming a large file needs no per-chunk allocations. limit caps the
+    number of bytes read (for example the size of a WAV data chunk).
+    """
+    remaining = limit
+    if hasattr(fileobj, "readinto"):
+        buffer = bytearray(chunk_bytes)
+        view = memoryview(buffer)
+        while remaining is None or remaining > 0:
+            size = chunk_bytes if remaining is None else min(chunk_bytes, remaining)
+            count = fileobj.readinto(view[:size])
+            if not count:
+                break
+            stream.write(_as_write_buffer(view[:count]))
+            if remaining is not None:
+                remaining -= count
+    else:
+        while remaining is None or remaining > 0:
+            data = fileobj.read(chunk_bytes if remaining is None else min(chunk_bytes, remaining))
+            if not data:
+                break
+            stream.write(data)
+            if remaining is not None:
+                remaining -= len(data)
+    if close:
+        stream.close()
+
+
+def open_stream_source(fileobj, sample_rate=DEFAULT_SAMPLE_RATE):
+    """Create a push stream for a file-like object holding WAV or raw 16-bit PCM
+
+    Returns (stream, audio_config, feed) where feed() copies the audio into
+    the stream and closes it.
+    """
+    limit = None
+    channels = 1
+    if hasattr(fileobj, "seekable") and fileobj.seekable():
+        position = fileobj.tell()
+        is_wav = fileobj.read(4) == b"RIFF"
+        fileobj.seek(position)
+        if is_wav:
+            sample_rate, channels, limit = read_wav_header(fileobj)
+    stream, audio_config = create_push_stream(sample_rate, channels)
+    return stream, audio_config, lambda: write_file(stream, fileobj, limit=limit)
+
+
+class AudioTape:
+    """The most recent max_seconds of an int16 recording, sliceable while it is being appended to
+
+    Samples go into a fixed ring buffer, so memory stays constant however
+    long the recording runs. Indices count from the start of the recording;
+    start is the first sample still held, and slices return a copy of the
+    requested samples that are still held.
+    """
+
+    def __init__(self, max_seconds=300, sample_rate=DEFAULT_SAMPLE_RATE):
+        self._samples = np.zeros(int(max_seconds * sample_rate), dtype=np.int16)
+        self._length = 0
+        self._lock = threading.Lock()
+
+    @property
+    def start(self):
+        return max(0, self._length - len(self._samples))
+
+    def append(self, data):
+        """Add a block of int16 samples (an array or any bytes-like object)"""
+        block = np.frombuffer(data, dtype=np.int16) if not isinstance(data, np.ndarray) else data.reshape(-1)
+        capacity = len(self._samples)
+        with self._lock:
+            end = self._length + len(block)
+            block = block[-capacity:]
+            position = (end - len(block)) % capacity
+            first = min(len(block), capacity - position)
+            self._samples[position:position + first] = block[:first]
+            self._samples[:len(block) - first] = block[first:]
+            self._length = end
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("AudioTape only supports contiguous slices")
+        capacity = len(self._samples)
+        with self._lock:
+            start, stop, _ = key.indices(self._length)
+            start = max(start, self.start)
+            if stop <= start:
+                return np.zeros(0, dtype=np.int16)
+            position = start % capacity
+            first = min(stop - start, capacity - position)
+            return np.concatenate((self._samples[position:position + first],
+                                   self._samples[:stop - start - first]))
+
+
+class MicrophonePushSource:
+    """Feeds a sounddevice input stream into a push stream from the audio callback
+
+    tap, if given, is called with every captured block as well, e.g. an
+    AudioTape.append to keep the audio for later use.
+    """
+
+    def __init__(self, stream, sample_rate=DEFAULT_SAMPLE_RATE, channels=1, device=None,
+                 blocksize=DEFAULT_CHUNK_FRAMES, tap=None):
+        # Imported here so in-memory and file sources work on machines without PortAudio
+        import sounddevice as sd
+
+        self.stream = stream
+        self.tap = tap
+        self.input_stream = sd.RawInputStream(
+            samplerate=sample_rate,
+            channels=channels,
+            dtype='int16',
+            device=device,
+            blocksize=blocksize,
+            callback=self._callback
+        )
+
+    def _callback(self, indata, frames, time_info, status):
+        """Hand each captured block to the push stream without copying it first"""
+        self.stream.write(_as_write_buffer(memoryview(indata)))
+        if self.tap is not None:
+            self.tap(indata)
+
+    def start(self):
+        self.input_stream.start()
+
+    def stop(self):
+        """Stop capturing and signal end of audio to the recognizer"""
+        self.input_stream.stop()
+        self.input_stream.close()
+        self.stream.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
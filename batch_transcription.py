@@ -0,0 +1,200 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+import soundfile as sf
+import azure.cognitiveservices.speech as speechsdk
+from transcription_session import TranscriptionSession
+from metrics import metrics_from_env
+from transcript_cache import file_cache_key
+
+AUDIO_EXTENSIONS = (".wav",)
+
+
+def collect_audio_files(source):
+    """Return the audio files in a directory, or the paths listed in a manifest file
+
+    A manifest is a text file with one audio path per line. Blank lines and
+    lines starting with '#' are ignored; relative paths are resolved against
+    the manifest's directory.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name)
+            for name in os.listdir(source)
+            if name.lower().endswith(AUDIO_EXTENSIONS)
+        )
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            paths.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return paths
+
+
+def audio_duration(path):
+    """Return the duration of an audio file in seconds, or 0.0 if it cannot be read"""
+    try:
+        return sf.info(path).duration
+    except Exception:
+        return 0.0
+
+
+class BatchResult:
+    """Outcome of transcribing one file (or other batch item) in a batch"""
+
+    def __init__(self, path, transcript=None, error=None, elapsed=0.0, audio_seconds=0.0, cached=False):
+        self.path = path
+        self.transcript = transcript
+        self.error = error
+        self.elapsed = elapsed
+        self.audio_seconds = audio_seconds
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BatchSummary:
+    """Throughput figures for a finished batch"""
+
+    def __init__(self, batch_results, wall_seconds):
+        self.files = len(batch_results)
+        self.succeeded = sum(1 for r in batch_results if r.ok)
+        self.cached = sum(1 for r in batch_results if r.cached)
+        self.failed = self.files - self.succeeded
+        self.wall_seconds = wall_seconds
+        self.audio_seconds = sum(r.audio_seconds for r in batch_results if r.ok)
+
+    @property
+    def files_per_minute(self):
+        return self.files / self.wall_seconds * 60 if self.wall_seconds else 0.0
+
+    @property
+    def speedup(self):
+        """Seconds of audio transcribed per second of wall-clock time"""
+        return self.audio_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+
+class BatchTranscriber:
+    """Transcribes many files with at most max_concurrency sessions open at once
+
+    Sessions are event driven, so the pool does not hold a thread per file:
+    the calling thread waits on the session futures and starts the next file
+    as soon as one finishes. A failing file is recorded in its BatchResult
+    and does not affect the others.
+    """
+
+    def __init__(self, speech_config, max_concurrency=4, timeout=None, cache=None, transcriber_factory=None,
+                 metrics=None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.speech_config = speech_config
+        # Builds the ConversationTranscriber for each file; replaceable, e.g. by fake_speech_sdk for benchmarks
+        self.transcriber_factory = transcriber_factory or speechsdk.transcription.ConversationTranscriber
+        self.metrics = metrics or metrics_from_env()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.cache = cache
+
+    def _cache_key(self, audio_file_path):
+        """Cache key for a batch item, or None when the batch is not cached"""
+        if self.cache is None:
+            return None
+        return file_cache_key(audio_file_path, self.speech_config)
+
+    def _create_session(self, audio_file_path):
+        """Create a session for one file without any console callbacks"""
+        audio_config = speechsdk.audio.AudioConfig(filename=audio_file_path)
+        conversation_transcriber = self.transcriber_factory(
+            speech_config=self.speech_config,
+            audio_config=audio_config
+        )
+        return TranscriptionSession(conversation_transcriber, timer=self._timer(audio_file_path))
+
+    def _start(self, item):
+        """Create and start the session for an item; returns (future, session)"""
+        session = self._create_session(item)
+        return session.start(), session
+
+    def _timer(self, item, source="batch"):
+        """Metrics timer for a batch item, or None when metrics are off"""
+        if not self.metrics.enabled:
+            return None
+        return self.metrics.timer(source, audio_seconds=self._audio_seconds(item))
+
+    def _audio_seconds(self, audio_file_path):
+        """Duration of a batch item, used for the throughput summary"""
+        return audio_duration(audio_file_path)
+
+    def _finish(self, path, session, started, key):
+        """Stop a finished session and turn its outcome into a BatchResult"""
+        session.stop()
+        elapsed = time.perf_counter() - started
+        error = session.future.exception() if session.done() else TimeoutError("Transcription timed out")
+        if error is not None:
+            return BatchResult(path, error=error, elapsed=elapsed)
+        transcript = session.future.result()
+        if key is not None:
+            self.cache.put(key, transcript)
+        return BatchResult(path, transcript=transcript, elapsed=elapsed, audio_seconds=self._audio_seconds(path))
+
+    def transcribe(self, paths, on_result=None):
+        """Transcribe every path and return a (results, summary) tuple
+
+        on_result, if given, is called with each BatchResult as soon as its
+        file completes. Results are returned in input order.
+        """
+        batch_started = time.perf_counter()
+        results = {}
+        pending = {}
+
+        def reap(done_futures):
+            for future in done_futures:
+                index, path, session, started, key = pending.pop(future)
+                results[index] = self._finish(path, session, started, key)
+                if on_result:
+                    on_result(results[index])
+
+        def reap_expired():
+            if self.timeout is None:
+                return
+            now = time.perf_counter()
+            expired = [f for f, (_, _, _, started, _) in pending.items() if now - started > self.timeout]
+            reap(expired)
+
+        for index, path in enumerate(paths):
+            while len(pending) >= self.max_concurrency:
+                done, _ = wait(list(pending), timeout=self.timeout, return_when=FIRST_COMPLETED)
+                reap(done)
+                reap_expired()
+
+            started = time.perf_counter()
+            try:
+                # Files already transcribed with the same settings never open a session
+                key = self._cache_key(path)
+                transcript = self.cache.get(key) if key is not None else None
+                if transcript is not None:
+                    results[index] = BatchResult(path, transcript=transcript, elapsed=time.perf_counter() - started,
+                                                 audio_seconds=self._audio_seconds(path), cached=True)
+                    if on_result:
+                        on_result(results[index])
+                    continue
+                future, session = self._start(path)
+                pending[future] = (index, path, session, started, key)
+            except Exception as e:
+                results[index] = BatchResult(path, error=e, elapsed=time.perf_counter() - started)
+                if on_result:
+                    on_result(results[index])
+
+        while pending:
+            done, _ = wait(list(pending), timeout=self.timeout, return_when=FIRST_COMPLETED)
+            reap(done)
+            reap_expired()
+
+        ordered = [results[i] for i in sorted(results)]
+        return ordered, BatchSummary(ordered, time.perf_counter() - batch_started)
@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+import numpy as np
+import soundfile as sf
+from fake_speech_sdk import FakeSpeechSDK, script_seconds, synthetic_script
+
+# Every benchmark runs offline; the Speech SDK only needs a syntactically valid configuration
+os.environ.setdefault('AZURE_SPEECH_KEY', 'benchmark')
+os.environ.setdefault('AZURE_SPEECH_REGION', 'westus')
+os.environ.pop('AZURE_SPEECH_PREWARM', None)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Whether a larger value of each metric is better, used when comparing against a baseline
+HIGHER_IS_BETTER = {
+    "events_per_second": True,
+    "files_per_second": True,
+    "audio_seconds_per_second": True,
+    "bytes_per_transcript_hour": False,
+    "import_seconds": False,
+    "construct_seconds": False,
+}
+
+
+def _quiet_sink(owner):
+    """An AsyncSink that formats events with the owner's formatter and discards the text"""
+    from output_sink import AsyncSink, ConsoleWriter
+    return AsyncSink(ConsoleWriter(owner._format_event, stream=open(os.devnull, "w")))
+
+
+def bench_callbacks(utterances):
+    """Events per second through the full callback path: session, sink queue and formatter"""
+    from metrics import NullMetrics
+    from speaker_identification import SpeakerIdentification
+    from continuos_speech_recognition import SimpleSpeechRecognition
+    from audio_stream import create_push_stream
+
+    script = synthetic_script(utterances=utterances)
+    fake = FakeSpeechSDK(script)
+    results = {}
+
+    identification = SpeakerIdentification(use_cache=False, metrics=NullMetrics(),
+                                           transcriber_factory=fake.conversation_transcriber)
+    identification.sink = _quiet_sink(identification)
+    _, audio_config = create_push_stream()
+    started = time.perf_counter()
+    session = identification._create_session(audio_config)
+    session.start()
+    session.wait()
+    identification.sink.flush()
+    results["speaker_identification.events_per_second"] = len(script) / (time.perf_counter() - started)
+    identification.profile_cache.stop()
+
+    recognition = SimpleSpeechRecognition(metrics=NullMetrics(), recognizer_factory=fake.speech_recognizer)
+    recognition.sink = _quiet_sink(recognition)
+    recognizer = recognition._create_recognizer()
+    done = []
+    recognizer.session_stopped.connect(lambda evt: done.append(True))
+    started = time.perf_counter()
+    recognizer.start_continuous_recognition()
+    while not done:
+        time.sleep(0.001)
+    recognition.sink.flush()
+    results["simple_recognition.events_per_second"] = len(script) / (time.perf_counter() - started)
+    return results
+
+
+def bench_batch(workdir, files, utterances_per_file, max_concurrency=4):
+    """Files and audio seconds per second through BatchTranscriber with replayed sessions"""
+    import azure.cognitiveservices.speech as speechsdk
+    from batch_transcription import BatchTranscriber
+
+    script = synthetic_script(utterances=utterances_per_file)
+    seconds = script_seconds(script)
+    # Short real WAV files, so audio_duration and AudioConfig see valid input; the fake supplies the results
+    paths = []
+    for i in range(files):
+        path = os.path.join(workdir, f"batch_{i:04d}.wav")
+        sf.write(path, np.zeros(1600, dtype=np.int16), 16000, subtype="PCM_16")
+        paths.append(path)
+
+    fake = FakeSpeechSDK(script)
+    config = speechsdk.SpeechConfig(subscription=os.environ['AZURE_SPEECH_KEY'],
+                                    region=os.environ['AZURE_SPEECH_REGION'])
+    batch = BatchTranscriber(config, max_concurrency=max_concurrency, transcriber_factory=fake.conversation_transcriber)
+    started = time.perf_counter()
+    results, _ = batch.transcribe(paths)
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if not r.ok]
+    if failed:
+        raise RuntimeError(f"{len(failed)} batch items failed: {failed[0].error}")
+    return {
+        "batch.files_per_second": files / elapsed,
+        "batch.audio_seconds_per_second": files * seconds / elapsed,
+    }
+
+
+def bench_memory(hours):
+    """Bytes held by a finished transcript per hour of transcribed audio"""
+    from transcription_session import TranscriptionSession
+
+    script = [e for e in synthetic_script(utterances=int(hours * 3600 / 4.5)) if e["type"] == "transcribed"]
+    fake = FakeSpeechSDK(script)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    session = TranscriptionSession(fake.conversation_transcriber())
+    session.start()
+    transcript = session.wait()
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del transcript
+    return {"transcript.bytes_per_transcript_hour": held / (script_seconds(script) / 3600)}
+
+
+def bench_startup(workdir, runs):
+    """Seconds to import speaker_identification in a fresh interpreter and to construct it"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    imports = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import speaker_identification"], cwd=workdir, env=env, check=True)
+        imports.append(time.perf_counter() - started)
+
+    from metrics import NullMetrics
+    from speaker_identification import SpeakerIdentification
+    constructs = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        identification = SpeakerIdentification(use_cache=False, metrics=NullMetrics())
+        constructs.append(time.perf_counter() - started)
+        identification.profile_cache.stop()
+        identification.sink.close()
+    return {
+        "speaker_identification.import_seconds": statistics.median(imports),
+        "speaker_identification.construct_seconds": statistics.median(constructs),
+    }
+
+
+def run_benchmarks(workdir, quick=False, only=None):
+    """Run the selected benchmarks and return {metric: value}"""
+    scale = 0.1 if quick else 1.0
+    benchmarks = {
+        "callbacks": lambda: bench_callbacks(int(5000 * scale)),
+        "batch": lambda: bench_batch(workdir, int(200 * scale), 20),
+        "memory": lambda: bench_memory(1.0),
+        "startup": lambda: bench_startup(workdir, 3 if quick else 5),
+    }
+    results = {}
+    for name, bench in benchmarks.items():
+        if only and name not in only:
+            continue
+        print(f"Running {name}...", flush=True)
+        results.update(bench())
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the metrics that got worse than the baseline by more than tolerance (a fraction)"""
+    regressions = []
+    for metric, value in results.items():
+        previous = baseline.get(metric)
+        if not previous:
+            continue
+        higher_is_better = HIGHER_IS_BETTER[metric.rsplit(".", 1)[1]]
+        change = (value - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append((metric, previous, value, change))
+    return regressions
+
+
+def parse_args(argv):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks using a replayed Speech SDK")
+    parser.add_argument("--quick", action="store_true", help="Run smaller workloads")
+    parser.add_argument("--only", nargs="+", choices=["callbacks", "batch", "memory", "startup"],
+                        help="Run only these benchmarks")
+    parser.add_argument("--output", metavar="FILE", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="Compare against earlier --output results")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed fractional slowdown before a metric counts as a regression (default 0.25)")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function"""
+    args = parse_args(sys.argv[1:])
+    print("Offline Speech Benchmarks")
+    print("=" * 45)
+
+    # Profiles, caches and WAV files go to a scratch directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['SPEAKER_PROFILES_DB'] = os.path.join(workdir, "profiles.db")
+        os.chdir(workdir)
+        try:
+            results = run_benchmarks(workdir, quick=args.quick, only=args.only)
+        finally:
+            os.chdir(cwd)
+
+    print()
+    for metric, value in results.items():
+        print(f"{metric:<50} {value:>14,.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for metric, previous, value, change in regressions:
+            print(f"REGRESSION {metric}: {previous:,.3f} -> {value:,.3f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import os
+import csv
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from audio_stream import read_pcm16
+from enrollment_quality import check_enrollment_file
+from speaker_embedding import update_profile_embedding
+
+AUDIO_EXTENSIONS = (".wav",)
+
+
+def collect_enrollments(source):
+    """Return {speaker name: [wav paths]} from a directory or a CSV manifest
+
+    A directory holds one sub-directory of .wav files per speaker (named
+    after the speaker) and/or loose .wav files named after the speaker. A
+    CSV has name,path rows, one per file, with paths relative to the CSV;
+    a header row is optional.
+    """
+    speakers = {}
+    if os.path.isdir(source):
+        for entry in sorted(os.scandir(source), key=lambda e: e.name):
+            if entry.is_dir():
+                files = sorted(
+                    os.path.join(entry.path, name) for name in os.listdir(entry.path)
+                    if name.lower().endswith(AUDIO_EXTENSIONS)
+                )
+                if files:
+                    speakers.setdefault(entry.name, []).extend(files)
+            elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                speakers.setdefault(os.path.splitext(entry.name)[0], []).append(entry.path)
+        return speakers
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='') as f:
+        for line_number, row in enumerate(csv.reader(f), 1):
+            if not row or not "".join(row).strip() or row[0].lstrip().startswith("#"):
+                continue
+            if len(row) < 2:
+                raise ValueError(f"{source}:{line_number}: expected 'name,path'")
+            name, path = row[0].strip(), row[1].strip()
+            if line_number == 1 and (name.lower(), path.lower()) == ("name", "path"):
+                continue
+            speakers.setdefault(name, []).append(os.path.join(base, path))
+    return speakers
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads"""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class EnrollmentResult:
+    """Outcome of enrolling one speaker"""
+
+    def __init__(self, name, profile_id=None, status=None, uploaded=0, skipped=0, error=None, elapsed=0.0):
+        self.name = name
+        self.profile_id = profile_id
+        self.status = status
+        self.uploaded = uploaded
+        self.skipped = skipped
+        self.error = error
+        self.elapsed = elapsed
+        # (path, reasons) for files that failed the local quality check
+        self.rejected = []
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "profile_id": self.profile_id,
+            "status": self.status,
+            "uploaded": self.uploaded,
+            "skipped": self.skipped,
+            "rejected": [{"path": path, "problems": problems} for path, problems in self.rejected],
+            "error": self.error,
+            "elapsed": round(self.elapsed, 3)
+        }
+
+
+class BulkEnroller:
+    """Creates profiles and uploads enrollment audio for many speakers concurrently
+
+    Progress is written to the profile store after every call: the profile
+    is saved as soon as it is created and each uploaded file is added to
+    its enrolled_files list. Running the same source again therefore reuses
+    existing profiles and only uploads files that did not make it, so a
+    partially failed run can simply be repeated.
+    """
+
+    def __init__(self, registration, max_concurrency=4, requests_per_second=None, quality_check=True,
+                 min_file_speech_seconds=4.0):
+        self.registration = registration
+        self.store = registration.store
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(requests_per_second)
+        self.quality_check = quality_check
+        self.min_file_speech_seconds = min_file_speech_seconds
+
+    def _usable(self, path, result):
+        """Run the local quality check on a file; rejected files are recorded on the result"""
+        if not self.quality_check:
+            return True
+        try:
+            quality = check_enrollment_file(path, min_speech_seconds=self.min_file_speech_seconds)
+        except (OSError, RuntimeError, ValueError) as e:
+            result.rejected.append((path, [f"unreadable: {e}"]))
+            return False
+        if not quality.ok:
+            result.rejected.append((path, quality.problems))
+        return quality.ok
+
+    def _profile_for(self, name, files):
+        """Create and save a new profile for a speaker"""
+        self.limiter.acquire()
+        profile_id = self.registration.create_speaker_profile_api()
+        if not profile_id:
+            raise RuntimeError("profile creation failed")
+        profile = {
+            "name": name,
+            "profile_id": profile_id,
+            "created_date": datetime.now().isoformat(),
+            "audio_file": files[0],
+            "enrollment_status": "Pending",
+            "enrollments_count": 0,
+            "speech_length_sec": 0,
+            "remaining_speech_sec": 20,
+            "enrolled_files": []
+        }
+        self.store.upsert(profile_id, profile)
+        return profile_id, profile
+
+    def enroll_speaker(self, name, files):
+        """Enroll every not yet uploaded file of one speaker"""
+        started = time.monotonic()
+        result = EnrollmentResult(name)
+        try:
+            result.profile_id = self.store.find_by_name(name)
+            profile = self.store.get(result.profile_id) if result.profile_id else {}
+            enrolled = list(profile.get("enrolled_files", []))
+            result.status = profile.get("enrollment_status")
+
+            # Files are checked locally first so no API calls are spent on unusable audio
+            pending = []
+            for path in files:
+                if os.path.abspath(path) in enrolled:
+                    result.skipped += 1
+                elif self._usable(path, result):
+                    pending.append(path)
+            if pending and result.profile_id is None:
+                result.profile_id, profile = self._profile_for(name, pending)
+            elif result.profile_id is None:
+                raise RuntimeError("no usable enrollment audio")
+
+            for path in pending:
+                self.limiter.acquire()
+                enrollment = self.registration.enroll_voice_sample_api(result.profile_id, path)
+                if not enrollment:
+                    raise RuntimeError(f"enrollment of {path} failed")
+                enrolled.append(os.path.abspath(path))
+                result.uploaded += 1
+                result.status = enrollment.get("enrollmentStatus", "Unknown")
+                # Record the upload first so a resumed run never sends this file again
+                self.store.update(
+                    result.profile_id,
+                    enrolled_files=enrolled,
+                    enrollment_status=result.status,
+                    enrollments_count=enrollment.get("enrollmentsCount", 0),
+                    speech_length_sec=enrollment.get("enrollmentsSpeechLengthInSec", 0),
+                    remaining_speech_sec=enrollment.get("remainingEnrollmentsSpeechLengthInSec", 0)
+                )
+                try:
+                    update_profile_embedding(self.store, result.profile_id, *read_pcm16(path))
+                except Exception as e:
+                    print(f"⚠️  {name}: voice embedding not updated from {path}: {e}")
+        except Exception as e:
+            result.error = str(e)
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def enroll(self, speakers, on_result=None):
+        """Enroll {name: [paths]} and return the per-speaker results in input order"""
+        order = {name: i for i, name in enumerate(speakers)}
+        results = [None] * len(order)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = [pool.submit(self.enroll_speaker, name, files) for name, files in speakers.items()]
+            for future in as_completed(futures):
+                result = future.result()
+                results[order[result.name]] = result
+                if on_result:
+                    on_result(result)
+        return results
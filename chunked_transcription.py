@@ -0,0 +1,227 @@
+import threading
+import numpy as np
+from audio_stream import create_push_stream, read_pcm16, write_pcm
+from batch_transcription import BatchTranscriber
+from transcript import TICKS_PER_SECOND, Transcript
+from transcription_session import TranscriptionSession
+from voice_activity import frame_energy_db, remove_silence
+
+# Speaker labels that cannot be linked across chunks and are kept as-is
+UNLINKED_SPEAKERS = frozenset(("", "Unknown"))
+
+
+def find_split_points(pcm, sample_rate, target_seconds=300, search_seconds=30, frame_ms=30):
+    """Choose cut points roughly every target_seconds, each at the quietest nearby moment
+
+    Each cut is placed at the minimum of the smoothed frame energy within
+    search_seconds either side of the target, so chunks end in silence
+    rather than mid-word. Returns sample indices.
+    """
+    energy = frame_energy_db(pcm, sample_rate, frame_ms)
+    frames_per_second = 1000 / frame_ms
+    # Smooth over ~300 ms so a single quiet frame inside a word does not win
+    window = max(1, int(0.3 * frames_per_second))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode='same')
+
+    frame_len = int(sample_rate * frame_ms / 1000)
+    total_frames = len(smoothed)
+    target = int(target_seconds * frames_per_second)
+    search = int(search_seconds * frames_per_second)
+
+    cuts = []
+    position = target
+    while position < total_frames - target // 2:
+        lo = max(position - search, (cuts[-1] // frame_len + 1) if cuts else 1)
+        hi = min(position + search, total_frames - 1)
+        if lo >= hi:
+            break
+        cut_frame = lo + int(np.argmin(smoothed[lo:hi]))
+        cuts.append(cut_frame * frame_len)
+        position = cut_frame + target
+    return cuts
+
+
+class Chunk:
+    """A window of the recording transcribed by one session
+
+    start/end include the overlap shared with neighbouring chunks;
+    keep_from/keep_to are the silence cut points, and only utterances
+    starting inside [keep_from, keep_to) are taken from this chunk.
+    """
+
+    __slots__ = ("index", "start", "end", "keep_from", "keep_to")
+
+    def __init__(self, index, start, end, keep_from, keep_to):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.keep_from = keep_from
+        self.keep_to = keep_to
+
+
+def plan_chunks(total_samples, cuts, overlap_samples):
+    """Turn cut points into overlapping chunks"""
+    boundaries = [0] + list(cuts) + [total_samples]
+    return [
+        Chunk(i, max(0, boundaries[i] - overlap_samples), min(total_samples, boundaries[i + 1] + overlap_samples),
+              boundaries[i], boundaries[i + 1])
+        for i in range(len(boundaries) - 1)
+    ]
+
+
+def link_speakers(previous, current, previous_labels):
+    """Map the current chunk's speaker labels onto the global labels of the previous chunk
+
+    previous and current are lists of Segment objects from the overlap
+    region, already on the recording timeline. Each pair of utterances that
+    overlap in time votes for linking their speakers, weighted by overlap
+    length; links are assigned greedily by weight. Speakers with no
+    overlapping evidence are left out of the returned mapping.
+    """
+    votes = {}
+    for a in previous:
+        global_label = previous_labels.get(a.speaker)
+        if global_label is None or a.speaker in UNLINKED_SPEAKERS:
+            continue
+        for b in current:
+            if b.speaker in UNLINKED_SPEAKERS:
+                continue
+            overlap = min(a.offset + a.duration, b.offset + b.duration) - max(a.offset, b.offset)
+            if overlap > 0:
+                key = (b.speaker, global_label)
+                votes[key] = votes.get(key, 0) + overlap
+
+    mapping = {}
+    used = set()
+    for (local, global_label), _ in sorted(votes.items(), key=lambda item: item[1], reverse=True):
+        if local not in mapping and global_label not in used:
+            mapping[local] = global_label
+            used.add(global_label)
+    return mapping
+
+
+def stitch_chunks(chunks, transcripts, sample_rate):
+    """Merge per-chunk transcripts onto the recording timeline with consistent speaker labels"""
+    merged = Transcript()
+    speaker_count = 0
+
+    def next_label():
+        nonlocal speaker_count
+        speaker_count += 1
+        return f"Guest-{speaker_count}"
+
+    def to_ticks(samples):
+        return samples * TICKS_PER_SECOND // sample_rate
+
+    previous_segments = []
+    previous_labels = {}
+    previous_end = 0
+    for chunk, transcript in zip(chunks, transcripts):
+        shift = to_ticks(chunk.start)
+        segments = list(transcript)
+        for segment in segments:
+            segment.offset += shift
+
+        # Only utterances inside the region both chunks heard take part in linking
+        overlap_start = shift
+        overlap_end = to_ticks(previous_end)
+        labels = link_speakers(
+            [s for s in previous_segments if s.offset + s.duration > overlap_start],
+            [s for s in segments if s.offset < overlap_end],
+            previous_labels
+        )
+        for segment in segments:
+            if segment.speaker not in labels:
+                labels[segment.speaker] = segment.speaker if segment.speaker in UNLINKED_SPEAKERS else next_label()
+
+        keep_from = to_ticks(chunk.keep_from) if chunk.index > 0 else 0
+        keep_to = to_ticks(chunk.keep_to) if chunk.index < len(chunks) - 1 else None
+        for segment in segments:
+            if segment.offset >= keep_from and (keep_to is None or segment.offset < keep_to):
+                merged.append(labels[segment.speaker], segment.text, segment.offset, segment.duration)
+
+        previous_segments = segments
+        previous_labels = labels
+        previous_end = chunk.end
+    return merged
+
+
+class _ChunkBatch(BatchTranscriber):
+    """Runs the chunks of one recording through the bounded session pool"""
+
+    def __init__(self, speech_config, pcm, sample_rate, max_concurrency, transcriber_factory=None, metrics=None):
+        super().__init__(speech_config, max_concurrency=max_concurrency, transcriber_factory=transcriber_factory,
+                         metrics=metrics)
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+
+    def _start(self, chunk):
+        """Start a chunk's session, then stream its audio from a feed thread as it is read"""
+        stream, audio_config = create_push_stream(self.sample_rate)
+        conversation_transcriber = self.transcriber_factory(
+            speech_config=self.speech_config,
+            audio_config=audio_config
+        )
+        session = TranscriptionSession(conversation_transcriber, timer=self._timer(chunk, "chunk"))
+        future = session.start()
+        threading.Thread(target=self._feed, args=(stream, chunk, session), name="chunk-feed", daemon=True).start()
+        return future, session
+
+    def _feed(self, stream, chunk, session):
+        try:
+            write_pcm(stream, self.pcm[chunk.start:chunk.end])
+        except Exception as e:
+            print(f"Could not stream chunk at {chunk.start / self.sample_rate:.0f}s: {e}")
+            session.stop()
+
+    def _audio_seconds(self, chunk):
+        return (chunk.end - chunk.start) / self.sample_rate
+
+
+class ChunkedTranscriber:
+    """Transcribes a long recording as concurrent chunks split at silences"""
+
+    def __init__(self, speech_config, max_concurrency=4, chunk_seconds=300, overlap_seconds=10,
+                 skip_silence=False, transcriber_factory=None, metrics=None):
+        self.speech_config = speech_config
+        self.transcriber_factory = transcriber_factory
+        self.metrics = metrics
+        self.max_concurrency = max_concurrency
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.skip_silence = skip_silence
+
+    def transcribe_pcm(self, pcm, sample_rate):
+        """Transcribe int16 mono samples and return the stitched Transcript"""
+        if self.skip_silence:
+            filtered = remove_silence(pcm, sample_rate)
+            transcript = filtered.offset_map.map_transcript(self._transcribe_chunks(filtered.pcm, sample_rate))
+            transcript.metadata.update(filtered.report())
+            transcript.metadata["audio_seconds"] = round(filtered.original_seconds, 3)
+            return transcript
+        return self._transcribe_chunks(pcm, sample_rate)
+
+    def _transcribe_chunks(self, pcm, sample_rate):
+        """Split, transcribe concurrently and stitch"""
+        cuts = find_split_points(pcm, sample_rate, self.chunk_seconds)
+        chunks = plan_chunks(len(pcm), cuts, int(self.overlap_seconds * sample_rate))
+        batch = _ChunkBatch(self.speech_config, pcm, sample_rate, self.max_concurrency, self.transcriber_factory,
+                            self.metrics)
+        results, summary = batch.transcribe(chunks)
+
+        failed = [r for r in results if not r.ok]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(chunks)} chunks failed: {failed[0].error}")
+
+        transcript = stitch_chunks(chunks, [r.transcript for r in results], sample_rate)
+        transcript.metadata.update({
+            "chunks": len(chunks),
+            "wall_seconds": round(summary.wall_seconds, 3),
+            "audio_seconds": round(len(pcm) / sample_rate, 3)
+        })
+        return transcript
+
+    def transcribe_file(self, audio_file_path):
+        """Transcribe a long audio file and return the stitched Transcript"""
+        pcm, sample_rate = read_pcm16(audio_file_path)
+        return self.transcribe_pcm(pcm, sample_rate)
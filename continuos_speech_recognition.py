@@ -3,20 +3,43 @@ import time
 from datetime import datetime
 from dotenv import load_dotenv
 import azure.cognitiveservices.speech as speechsdk
+from output_sink import AsyncSink, coalesce_interims, ConsoleWriter, OutputEvent
+from session_pool import WarmPool, prewarm_enabled
+from transcription_session import LatencyTimer
+from metrics import metrics_from_env
 
 # Load environment variables
 load_dotenv()
 
 class SimpleSpeechRecognition:
-    def __init__(self):
+    def __init__(self, sink=None, prewarm=None, metrics=None, recognizer_factory=None):
         # Azure Speech Service configuration
         self.speech_key = os.getenv('AZURE_SPEECH_KEY')
         self.speech_region = os.getenv('AZURE_SPEECH_REGION')
         # self.speech_endpoint = os.getenv('AZURE_SPEECH_ENDPOINT')
         
+        # Callbacks only queue events; the sink does the formatting and I/O on its own thread.
+        # With INTERIM_MAX_RATE set, interim hypotheses are thinned out before they are queued
+        self.sink = coalesce_interims(sink or AsyncSink(ConsoleWriter(self._format_event)))
+        
         # Initialize Azure Speech SDK
         self._initialize_speech_config()
         
+        # Builds the SpeechRecognizer; fake_speech_sdk provides an offline replacement
+        self.recognizer_factory = recognizer_factory or speechsdk.SpeechRecognizer
+        
+        # Time from starting recognition to the first partial and final results
+        self.latency = LatencyTimer()
+        
+        # Session timings for SPEECH_METRICS_FILE; the timer stays None when metrics are off
+        self.metrics = metrics or metrics_from_env()
+        self.timer = None
+        
+        # Optionally keep a recognizer with an open connection ready for the next call
+        self.warm_pool = None
+        if prewarm_enabled(prewarm):
+            self.warm_pool = WarmPool(self._create_recognizer, lambda recognizer: recognizer)
+        
     def _initialize_speech_config(self):
         """Initialize Azure Speech SDK configuration"""
         if not self.speech_key or not self.speech_region:
@@ -39,33 +62,83 @@ class SimpleSpeechRecognition:
         #     "speech_log.txt"
         # )
         
+    def _format_event(self, event):
+        """Render a queued event as console text; runs on the sink's writer thread"""
+        if event.kind == "recognized":
+            timestamp = datetime.fromtimestamp(event.timestamp).strftime("%H:%M:%S")
+            return f"[{timestamp}] Recognized: {event.text}\n"
+        if event.kind == "nomatch":
+            return f"No speech could be recognized: {event.detail}\n"
+        if event.kind == "recognizing":
+            return f"Recognizing: {event.text}\r"
+        if event.kind == "canceled":
+            return f"Recognition canceled: {event.detail}\n"
+        if event.kind == "session_started":
+            return "Speech recognition session started\n"
+        if event.kind == "session_stopped":
+            return "Speech recognition session stopped\n"
+        return None
+    
     def _recognized_callback(self, evt):
         """Callback for recognized speech"""
         if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            print(f"[{timestamp}] Recognized: {evt.result.text}")
+            self.latency.mark("first_result")
+            self.latency.mark("first_transcript")
+            if self.timer is not None:
+                self.timer.final(evt.result.offset, evt.result.duration)
+            self.sink.emit(OutputEvent("recognized", evt.result.text, offset=evt.result.offset,
+                                       duration=evt.result.duration))
         elif evt.result.reason == speechsdk.ResultReason.NoMatch:
-            print(f"No speech could be recognized: {evt.result.no_match_details}")
+            self.sink.emit(OutputEvent("nomatch", detail=str(evt.result.no_match_details)))
     
     def _recognizing_callback(self, evt):
         """Callback for intermediate recognition results"""
         current_text = evt.result.text
         if current_text:
-            print(f"Recognizing: {current_text}", end='\r')
+            self.latency.mark("first_result")
+            if self.timer is not None:
+                self.timer.interim()
+            self.sink.emit(OutputEvent("recognizing", current_text))
     
     def _canceled_callback(self, evt):
         """Callback for canceled recognition"""
-        print(f"Recognition canceled: {evt.result.cancellation_details.reason}")
-        if evt.result.cancellation_details.reason == speechsdk.CancellationReason.Error:
-            print(f"Error details: {evt.result.cancellation_details.error_details}")
+        details = evt.result.cancellation_details
+        detail = str(details.reason)
+        if details.reason == speechsdk.CancellationReason.Error:
+            detail += f"\nError details: {details.error_details}"
+        self.sink.emit(OutputEvent("canceled", detail=detail))
     
     def _session_started_callback(self, evt):
         """Callback for session started"""
-        print("Speech recognition session started")
+        if self.timer is not None:
+            self.timer.session_started()
+        self.sink.emit(OutputEvent("session_started"))
     
     def _session_stopped_callback(self, evt):
         """Callback for session stopped"""
-        print("Speech recognition session stopped")
+        self.sink.emit(OutputEvent("session_stopped"))
+    
+    def _create_recognizer(self):
+        """Create a microphone recognizer with the callbacks connected"""
+        audio_config = speechsdk.audio.AudioConfig(use_default_microphone=True)
+        speech_recognizer = self.recognizer_factory(
+            speech_config=self.speech_config,
+            audio_config=audio_config
+        )
+        
+        # Connect callbacks
+        speech_recognizer.recognized.connect(self._recognized_callback)
+        speech_recognizer.recognizing.connect(self._recognizing_callback)
+        speech_recognizer.canceled.connect(self._canceled_callback)
+        speech_recognizer.session_started.connect(self._session_started_callback)
+        speech_recognizer.session_stopped.connect(self._session_stopped_callback)
+        return speech_recognizer
+    
+    def close(self):
+        """Close any pre-opened connection and the output sink"""
+        if self.warm_pool is not None:
+            self.warm_pool.close()
+        self.sink.close()
     
     def start_recognition(self):
         """Start real-time speech recognition using default microphone"""
@@ -74,23 +147,17 @@ class SimpleSpeechRecognition:
         print("-" * 50)
         
         try:
-            # Create audio config using default microphone
-            audio_config = speechsdk.audio.AudioConfig(use_default_microphone=True)
-            
-            # Create speech recognizer
-            speech_recognizer = speechsdk.SpeechRecognizer(
-                speech_config=self.speech_config,
-                audio_config=audio_config
-            )
-            
-            # Connect callbacks
-            speech_recognizer.recognized.connect(self._recognized_callback)
-            speech_recognizer.recognizing.connect(self._recognizing_callback)
-            speech_recognizer.canceled.connect(self._canceled_callback)
-            speech_recognizer.session_started.connect(self._session_started_callback)
-            speech_recognizer.session_stopped.connect(self._session_stopped_callback)
+            # Take a pre-opened recognizer when available, otherwise connect now
+            if self.warm_pool:
+                speech_recognizer, warm = self.warm_pool.acquire()
+            else:
+                speech_recognizer, warm = self._create_recognizer(), False
             
             # Start continuous recognition
+            self.latency.start()
+            self.timer = self.metrics.timer("microphone", realtime=True)
+            if self.timer is not None:
+                self.timer.start()
             speech_recognizer.start_continuous_recognition()
             
             # Keep the program running
@@ -98,8 +165,14 @@ class SimpleSpeechRecognition:
                 time.sleep(0.1)
                 
         except KeyboardInterrupt:
+            self.sink.flush()
             print("\nStopping speech recognition...")
             speech_recognizer.stop_continuous_recognition()
+            if self.timer is not None:
+                self.timer.finish()
+            first = self.latency.marks.get("first_transcript")
+            if first is not None:
+                print(f"First transcript after {first:.2f}s ({'pre-warmed' if warm else 'cold'} connection)")
         except Exception as e:
             print(f"Error during recognition: {e}")
 
@@ -114,6 +187,7 @@ def main():
         print("See env_example.txt for reference")
         return
     
+    recognizer = None
     try:
         # Create and start speech recognition
         recognizer = SimpleSpeechRecognition()
@@ -123,6 +197,9 @@ def main():
         print("\nInterrupted by user")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        if recognizer is not None:
+            recognizer.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,100 @@
+import numpy as np
+from audio_stream import read_pcm16
+from voice_activity import DEFAULT_FRAME_MS, detect_speech, frame_energy_db
+
+# Samples at or beyond this magnitude count as clipped
+CLIP_LEVEL = 32767 - 16
+
+
+class QualityReport:
+    """Measurements of an enrollment recording and the problems found in it
+
+    problems make the recording unusable; warnings are worth telling the
+    speaker about but do not block enrollment.
+    """
+
+    def __init__(self, duration_seconds, speech_seconds, clipping_ratio, rms_db, snr_db):
+        self.duration_seconds = duration_seconds
+        self.speech_seconds = speech_seconds
+        self.clipping_ratio = clipping_ratio
+        self.rms_db = rms_db
+        self.snr_db = snr_db
+        self.problems = []
+        self.warnings = []
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def to_dict(self):
+        return {
+            "duration_seconds": round(self.duration_seconds, 2),
+            "speech_seconds": round(self.speech_seconds, 2),
+            "clipping_ratio": round(self.clipping_ratio, 5),
+            "rms_db": round(self.rms_db, 1),
+            "snr_db": round(self.snr_db, 1),
+            "problems": self.problems,
+            "warnings": self.warnings
+        }
+
+
+def measure_audio(pcm, sample_rate, frame_ms=DEFAULT_FRAME_MS):
+    """Measure net speech, clipping, level and SNR of int16 mono audio"""
+    pcm = np.asarray(pcm)
+    if pcm.ndim > 1:
+        pcm = pcm[:, 0]
+    duration = len(pcm) / sample_rate
+    if not len(pcm):
+        return QualityReport(0.0, 0.0, 0.0, -100.0, 0.0)
+
+    clipping_ratio = float(np.count_nonzero(np.abs(pcm.astype(np.int32)) >= CLIP_LEVEL)) / len(pcm)
+    samples = pcm.astype(np.float32)
+    rms_db = float(10 * np.log10(np.mean(samples * samples) / 32768.0 ** 2 + 1e-10))
+
+    # Net speech excludes the hangover padding used when cutting audio
+    energy = frame_energy_db(pcm, sample_rate, frame_ms)
+    speech = detect_speech(pcm, sample_rate, frame_ms, hangover_ms=0)
+    speech_seconds = float(np.count_nonzero(speech)) * frame_ms / 1000
+    if speech.any():
+        power = 10 ** (energy / 10)
+        # Recordings with no pauses fall back to the quietest frames as the noise estimate
+        noise = power[~speech] if (~speech).any() else np.sort(power)[:max(1, len(power) // 10)]
+        snr_db = float(10 * np.log10(power[speech].mean() / (noise.mean() + 1e-12)))
+    else:
+        # Nothing stood out from the floor (e.g. no pauses at all): use the spread of frame levels
+        snr_db = float(np.percentile(energy, 90) - np.percentile(energy, 10))
+    return QualityReport(duration, speech_seconds, clipping_ratio, rms_db, snr_db)
+
+
+def check_enrollment_audio(pcm, sample_rate, min_speech_seconds=20.0, max_clipping_ratio=0.01,
+                           min_rms_db=-40.0, min_snr_db=10.0, speech_seconds=None, noise_floor_db=None):
+    """Measure a recording and flag anything likely to make enrollment fail
+
+    Pass speech_seconds and noise_floor_db when they were already measured
+    on the raw input, e.g. by record_speech, whose output has most pauses
+    removed and so gives the offline detector no noise floor to work from.
+    """
+    report = measure_audio(pcm, sample_rate)
+    if speech_seconds is not None:
+        report.speech_seconds = speech_seconds
+    if noise_floor_db is not None:
+        report.snr_db = report.rms_db - noise_floor_db
+    if report.speech_seconds < min_speech_seconds:
+        report.problems.append(f"only {report.speech_seconds:.1f}s of speech (need {min_speech_seconds:.0f}s)")
+    if report.clipping_ratio > max_clipping_ratio:
+        report.problems.append(f"{report.clipping_ratio:.1%} of samples are clipped; lower the input gain")
+    elif report.clipping_ratio > max_clipping_ratio / 10:
+        report.warnings.append(f"some clipping ({report.clipping_ratio:.2%} of samples)")
+    if report.rms_db < min_rms_db:
+        report.problems.append(f"recording is too quiet ({report.rms_db:.0f} dBFS)")
+    if report.snr_db < min_snr_db:
+        report.problems.append(f"too much background noise (SNR {report.snr_db:.0f} dB)")
+    elif report.snr_db < min_snr_db + 5:
+        report.warnings.append(f"noticeable background noise (SNR {report.snr_db:.0f} dB)")
+    return report
+
+
+def check_enrollment_file(path, **kwargs):
+    """check_enrollment_audio for an audio file"""
+    pcm, sample_rate = read_pcm16(path)
+    return check_enrollment_audio(pcm, sample_rate, **kwargs)
@@ -0,0 +1,167 @@
+import os
+import time
+import struct
+import threading
+import azure.cognitiveservices.speech as speechsdk
+from output_sink import OutputEvent
+from transcript import Transcript
+
+MAGIC = b"SPEVLOG\x02"
+# kind, result reason, session ID, wall-clock timestamp, offset, duration (ticks), speaker and text byte lengths
+RECORD = struct.Struct("<BBIdqqBI")
+KINDS = ("session_started", "session_stopped", "transcribing", "transcribed", "nomatch", "canceled")
+_KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+
+class LoggedEvent:
+    """One recognizer event read back from an event log"""
+
+    __slots__ = ("kind", "reason", "timestamp", "offset", "duration", "speaker_id", "text", "session")
+
+    def __init__(self, kind, reason, timestamp, offset, duration, speaker_id, text, session):
+        self.kind = kind
+        self.reason = reason
+        self.timestamp = timestamp
+        self.offset = offset
+        self.duration = duration
+        self.speaker_id = speaker_id
+        self.text = text
+        self.session = session
+
+    def to_output_event(self):
+        """The event as the recognizers queue it for their sinks, keeping its original time"""
+        event = OutputEvent(self.kind, self.text or None, self.speaker_id or None, self.offset, self.duration,
+                            detail=self.text if self.kind in ("nomatch", "canceled") else None)
+        event.timestamp = self.timestamp
+        return event
+
+
+class EventLogWriter:
+    """Appends every event of the attached transcribers to a compact binary log
+
+    Each record is a fixed 35-byte header followed by the UTF-8 speaker ID
+    and text, so an hour of interim and final results takes a few hundred
+    kilobytes. The file is only ever appended to; several sessions can
+    share one log, even concurrently, and every attach gets its own
+    session ID in the header. Final results and session boundaries are
+    flushed to disk immediately, interim results are buffered.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._next_session = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # Continue after the sessions already in the log
+            self._next_session = max((event.session for event in read_event_log(path)), default=-1) + 1
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def write(self, kind, reason=0, offset=0, duration=0, speaker_id="", text="", session=0):
+        speaker = (speaker_id or "").encode("utf-8")[:255]
+        body = (text or "").encode("utf-8")
+        record = RECORD.pack(_KIND_CODES[kind], reason, session, time.time(), offset, duration,
+                             len(speaker), len(body))
+        with self._lock:
+            self._file.write(record + speaker + body)
+            if kind != "transcribing":
+                self._file.flush()
+
+    def attach(self, transcriber, offset_map=None):
+        """Log the events of a ConversationTranscriber; offset_map maps offsets back when silence was removed"""
+        with self._lock:
+            session = self._next_session
+            self._next_session += 1
+
+        def result_event(kind):
+            def log(evt):
+                result = evt.result
+                offset, duration = result.offset, result.duration
+                if offset_map is not None:
+                    offset, duration = offset_map.map_span(offset, duration)
+                if result.reason == speechsdk.ResultReason.NoMatch:
+                    self.write("nomatch", result.reason.value, offset, duration, text=str(result.no_match_details),
+                               session=session)
+                else:
+                    self.write(kind, result.reason.value, offset, duration, result.speaker_id, result.text, session)
+            return log
+
+        def canceled(evt):
+            details = evt.cancellation_details
+            self.write("canceled", details.reason.value, text=details.error_details or "", session=session)
+
+        transcriber.session_started.connect(lambda evt: self.write("session_started", session=session))
+        transcriber.session_stopped.connect(lambda evt: self.write("session_stopped", session=session))
+        transcriber.transcribing.connect(result_event("transcribing"))
+        transcriber.transcribed.connect(result_event("transcribed"))
+        transcriber.canceled.connect(canceled)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_event_log(path):
+    """Yield the LoggedEvents of a log in order; a record cut off by a crash ends the log"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a recognition event log")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            code, reason, session, timestamp, offset, duration, speaker_len, text_len = RECORD.unpack(header)
+            strings = f.read(speaker_len + text_len)
+            if len(strings) < speaker_len + text_len:
+                return
+            yield LoggedEvent(KINDS[code], reason, timestamp, offset, duration,
+                              strings[:speaker_len].decode("utf-8"), strings[speaker_len:].decode("utf-8"), session)
+
+
+def split_sessions(events):
+    """Group events into one list per session, in the order the sessions first appear
+
+    Events carry the session ID of the attach that logged them, so
+    sessions that ran at the same time (e.g. one per channel) are kept
+    apart.
+    """
+    sessions, by_id = [], {}
+    for event in events:
+        if event.session not in by_id:
+            by_id[event.session] = []
+            sessions.append(by_id[event.session])
+        by_id[event.session].append(event)
+    return sessions
+
+
+def session_transcript(events):
+    """Build the raw transcript (Azure speaker IDs) of one session from its final results"""
+    transcript = Transcript()
+    for event in events:
+        if event.kind == "transcribed":
+            transcript.append(event.speaker_id, event.text, event.offset, event.duration)
+    started = next((event.timestamp for event in events if event.kind == "session_started"), None)
+    if started is not None:
+        transcript.metadata["recorded_at"] = started
+    return transcript
+
+
+def replay_event_log(path, sink=None, include_interim=False):
+    """Re-emit a log's events to a sink and return one raw transcript per session
+
+    Nothing is sent to Azure: the sink's formatter and any speaker naming
+    run again over the stored results, so past sessions can be relabeled
+    after new profiles are enrolled.
+    """
+    sessions = split_sessions(read_event_log(path))
+    if sink is not None:
+        for events in sessions:
+            for event in events:
+                if include_interim or event.kind != "transcribing":
+                    sink.emit(event.to_output_event())
+    transcripts = [session_transcript(events) for events in sessions]
+    for transcript in transcripts:
+        transcript.metadata["event_log"] = os.path.abspath(path)
+    return transcripts
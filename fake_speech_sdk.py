@@ -0,0 +1,282 @@
+import json
+import time
+import threading
+import azure.cognitiveservices.speech as speechsdk
+from event_log import MAGIC, read_event_log, split_sessions
+
+# Speech SDK offsets and durations are in 100 ns ticks
+TICKS_PER_SECOND = 10_000_000
+
+
+def event_log_script(events):
+    """Convert the LoggedEvents of one event log session into a replayable script"""
+    script, started = [], None
+    for event in events:
+        if started is None:
+            started = event.timestamp
+        if event.kind in ("transcribing", "transcribed"):
+            entry = {"type": event.kind, "text": event.text, "speaker_id": event.speaker_id,
+                     "offset": event.offset, "duration": event.duration}
+        elif event.kind == "nomatch":
+            entry = {"type": "nomatch", "detail": event.text, "offset": event.offset, "duration": event.duration}
+        elif event.kind == "canceled" and event.reason == speechsdk.CancellationReason.Error.value:
+            entry = {"type": "canceled", "error": event.text}
+        else:
+            continue
+        entry["at"] = round(event.timestamp - started, 3)
+        script.append(entry)
+    return script
+
+
+def load_script(path, session=0):
+    """Read an event script: JSON Lines as written by EventRecorder, or one session of an event log"""
+    with open(path, "rb") as f:
+        is_event_log = f.read(len(MAGIC)) == MAGIC
+    if is_event_log:
+        return event_log_script(split_sessions(read_event_log(path))[session])
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_script(utterances=100, words=12, interims=3, speakers=2, utterance_seconds=4.0, gap_seconds=0.5):
+    """Return a script of utterances alternating between speakers, each with its interim hypotheses"""
+    script = []
+    offset = 0.0
+    for i in range(utterances):
+        speaker_id = f"Guest-{i % speakers + 1}"
+        text = " ".join(f"word{(i + w) % 50}" for w in range(words))
+        for k in range(1, interims + 1):
+            partial = text.split()[:max(1, words * k // (interims + 1))]
+            script.append({"type": "transcribing", "text": " ".join(partial), "speaker_id": speaker_id,
+                           "offset": int(offset * TICKS_PER_SECOND),
+                           "duration": int(utterance_seconds * k / (interims + 1) * TICKS_PER_SECOND)})
+        script.append({"type": "transcribed", "text": text + ".", "speaker_id": speaker_id,
+                       "offset": int(offset * TICKS_PER_SECOND),
+                       "duration": int(utterance_seconds * TICKS_PER_SECOND)})
+        offset += utterance_seconds + gap_seconds
+    return script
+
+
+def script_seconds(script):
+    """Audio seconds covered by a script"""
+    return max(((e.get("offset", 0) + e.get("duration", 0)) / TICKS_PER_SECOND for e in script), default=0.0)
+
+
+class FakeSignal:
+    """Stand-in for an SDK EventSignal"""
+
+    def __init__(self):
+        self._callbacks = []
+
+    def connect(self, callback):
+        self._callbacks.append(callback)
+
+    def disconnect_all(self):
+        self._callbacks = []
+
+    def fire(self, evt):
+        for callback in list(self._callbacks):
+            callback(evt)
+
+
+class FakeCancellationDetails:
+    def __init__(self, reason, error_details=""):
+        self.reason = reason
+        self.error_details = error_details
+
+
+class FakeResult:
+    """The attributes of an SDK recognition result that this project reads"""
+
+    def __init__(self, reason, text="", speaker_id="", offset=0, duration=0, no_match_details=None,
+                 cancellation_details=None):
+        self.reason = reason
+        self.text = text
+        self.speaker_id = speaker_id
+        self.offset = offset
+        self.duration = duration
+        self.no_match_details = no_match_details
+        self.cancellation_details = cancellation_details
+
+
+class FakeEventArgs:
+    def __init__(self, result=None, cancellation_details=None):
+        self.result = result
+        self.cancellation_details = cancellation_details
+
+    def __str__(self):
+        return f"FakeEventArgs(reason={getattr(self.result, 'reason', None)})"
+
+
+class _Completed:
+    """Stand-in for the ResultFuture returned by the SDK's *_async methods"""
+
+    def get(self):
+        return None
+
+
+def _event_args(event):
+    """Build SDK-like event arguments for one script entry"""
+    kind = event["type"]
+    common = dict(text=event.get("text", ""), speaker_id=event.get("speaker_id", ""),
+                  offset=event.get("offset", 0), duration=event.get("duration", 0))
+    if kind == "transcribing":
+        return FakeEventArgs(FakeResult(speechsdk.ResultReason.RecognizingSpeech, **common))
+    if kind == "transcribed":
+        return FakeEventArgs(FakeResult(speechsdk.ResultReason.RecognizedSpeech, **common))
+    if kind == "nomatch":
+        return FakeEventArgs(FakeResult(speechsdk.ResultReason.NoMatch, no_match_details=event.get("detail", ""),
+                                        **common))
+    if kind == "canceled":
+        details = FakeCancellationDetails(speechsdk.CancellationReason.Error, event.get("error", ""))
+        return FakeEventArgs(FakeResult(speechsdk.ResultReason.Canceled, cancellation_details=details), details)
+    raise ValueError(f"Unknown script event type: {kind}")
+
+
+class FakeConversationTranscriber:
+    """Replays a scripted event stream through the ConversationTranscriber interface
+
+    Events fire on a background thread, like SDK callbacks. Each event is
+    delivered when the audio clock reaches its "at" time (seconds, default
+    offset + duration) divided by speed; speed=0 replays as fast as the
+    callbacks allow. The session stops after the last event, or on a
+    canceled event, or when stop is called.
+    """
+
+    def __init__(self, script, speed=0.0, startup_seconds=0.0):
+        self.script = script
+        self.speed = speed
+        self.startup_seconds = startup_seconds
+        self.transcribing = FakeSignal()
+        self.transcribed = FakeSignal()
+        self.session_started = FakeSignal()
+        self.session_stopped = FakeSignal()
+        self.canceled = FakeSignal()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _signal_for(self, kind):
+        return {"transcribing": self.transcribing, "transcribed": self.transcribed,
+                "nomatch": self.transcribed, "canceled": self.canceled}[kind]
+
+    def _replay(self):
+        if self.startup_seconds:
+            time.sleep(self.startup_seconds)
+        self.session_started.fire(FakeEventArgs())
+        started = time.monotonic()
+        for event in self.script:
+            if self._stop.is_set():
+                break
+            if self.speed:
+                at = event.get("at", (event.get("offset", 0) + event.get("duration", 0)) / TICKS_PER_SECOND)
+                delay = at / self.speed - (time.monotonic() - started)
+                if delay > 0 and self._stop.wait(delay):
+                    break
+            self._signal_for(event["type"]).fire(_event_args(event))
+            if event["type"] == "canceled":
+                return
+        self.session_stopped.fire(FakeEventArgs())
+
+    def start_transcribing_async(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._replay, name="fake-transcriber", daemon=True)
+        self._thread.start()
+        return _Completed()
+
+    def stop_transcribing_async(self):
+        self._stop.set()
+        return _Completed()
+
+
+class FakeSpeechRecognizer(FakeConversationTranscriber):
+    """Replays a scripted event stream through the SpeechRecognizer interface"""
+
+    def __init__(self, script, speed=0.0, startup_seconds=0.0):
+        super().__init__(script, speed, startup_seconds)
+        # SpeechRecognizer names its interim and final signals differently
+        self.recognizing = self.transcribing
+        self.recognized = self.transcribed
+
+    def start_continuous_recognition_async(self):
+        return self.start_transcribing_async()
+
+    def stop_continuous_recognition_async(self):
+        return self.stop_transcribing_async()
+
+    def start_continuous_recognition(self):
+        self.start_continuous_recognition_async()
+
+    def stop_continuous_recognition(self):
+        self.stop_continuous_recognition_async()
+
+
+class FakeSpeechSDK:
+    """Transcriber and recognizer factories that replay one script for every session
+
+    Pass transcriber_factory=fake.conversation_transcriber (or
+    recognizer_factory=fake.speech_recognizer) to the recognizer classes to
+    run them without a network connection.
+    """
+
+    def __init__(self, script, speed=0.0, startup_seconds=0.0):
+        self.script = script
+        self.speed = speed
+        self.startup_seconds = startup_seconds
+        self.sessions = 0
+
+    def conversation_transcriber(self, speech_config=None, audio_config=None):
+        self.sessions += 1
+        return FakeConversationTranscriber(self.script, self.speed, self.startup_seconds)
+
+    def speech_recognizer(self, speech_config=None, audio_config=None):
+        self.sessions += 1
+        return FakeSpeechRecognizer(self.script, self.speed, self.startup_seconds)
+
+
+class EventRecorder:
+    """Writes the events of a real transcriber or recognizer to a script that can be replayed later"""
+
+    def __init__(self, transcriber, path):
+        self._file = open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started = None
+        transcriber.session_started.connect(self._session_started)
+        for name in ("transcribing", "recognizing"):
+            if hasattr(transcriber, name):
+                getattr(transcriber, name).connect(self._interim)
+        for name in ("transcribed", "recognized"):
+            if hasattr(transcriber, name):
+                getattr(transcriber, name).connect(self._final)
+        transcriber.canceled.connect(self._canceled)
+
+    def _session_started(self, evt):
+        self._started = time.monotonic()
+
+    def _write(self, event):
+        if self._started is not None:
+            event["at"] = round(time.monotonic() - self._started, 3)
+        with self._lock:
+            self._file.write(json.dumps(event) + "\n")
+
+    def _result_event(self, kind, result):
+        return {"type": kind, "text": result.text, "speaker_id": getattr(result, "speaker_id", "") or "",
+                "offset": result.offset, "duration": result.duration}
+
+    def _interim(self, evt):
+        self._write(self._result_event("transcribing", evt.result))
+
+    def _final(self, evt):
+        if evt.result.reason == speechsdk.ResultReason.NoMatch:
+            self._write({"type": "nomatch", "detail": str(evt.result.no_match_details),
+                         "offset": evt.result.offset, "duration": evt.result.duration})
+        else:
+            self._write(self._result_event("transcribed", evt.result))
+
+    def _canceled(self, evt):
+        details = evt.cancellation_details
+        if details.reason == speechsdk.CancellationReason.Error:
+            self._write({"type": "canceled", "error": details.error_details})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,136 @@
+import os
+import time
+import random
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Throttling and transient server errors worth another attempt
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# Methods that can be sent twice without changing the result
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+# For other methods, only statuses that mean the request was not processed
+UNPROCESSED_STATUSES = frozenset((429, 503))
+
+
+def parse_retry_after(value, now=None):
+    """Return the delay in seconds requested by a Retry-After header, or None
+
+    The header may hold a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+
+def is_connect_error(error):
+    """Whether a requests exception happened while connecting, before any of the request was sent"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError):
+        return False
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+
+class ApiClient:
+    """Pooled HTTP client for a REST API with timeouts and retry
+
+    One requests.Session is shared by every call, so connections are kept
+    alive and reused instead of paying a TCP and TLS handshake per request.
+    Idempotent requests are retried on connection errors, timeouts and
+    RETRY_STATUSES. Other requests (POST) could be applied twice, so they
+    are only retried when the connection could not be made or the server
+    answered with UNPROCESSED_STATUSES. Retries use full jitter
+    exponential backoff; a Retry-After header from the server takes
+    precedence over the computed delay. When retries run out the last
+    response is returned (or the last exception raised), so callers keep
+    handling status codes as before.
+    """
+
+    def __init__(self, base_url, headers=None, timeout=None, max_retries=None, backoff_base=0.5,
+                 backoff_max=30.0, pool_size=10, sleep=time.sleep):
+        self.base_url = base_url.rstrip("/")
+        if timeout is None:
+            timeout = float(os.getenv('AZURE_HTTP_TIMEOUT', 30))
+        if max_retries is None:
+            max_retries = int(os.getenv('AZURE_HTTP_MAX_RETRIES', 4))
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        # Retries are handled here so Retry-After and body rewinding work the same for every call
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _url(self, path):
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _backoff(self, attempt, retry_after=None):
+        """Seconds to wait before the given retry attempt (1-based)"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, path, **kwargs):
+        """Send a request, retrying transient failures; returns the final response"""
+        kwargs.setdefault("timeout", self.timeout)
+        # File-like bodies are rewound before each retry
+        body = kwargs.get("data")
+        body_start = body.tell() if hasattr(body, "seek") and hasattr(body, "tell") else None
+        url = self._url(path)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+
+        attempt = 0
+        while True:
+            if attempt and body_start is not None:
+                body.seek(body_start)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries or not (idempotent or is_connect_error(e)):
+                    raise
+                retry_after = None
+            else:
+                if response.status_code not in retry_statuses or attempt >= self.max_retries:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.close()
+            attempt += 1
+            self._sleep(self._backoff(attempt, retry_after))
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
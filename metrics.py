@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import bisect
+import tempfile
+import threading
+
+# Upper bounds (seconds) for latency histograms
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+# Upper bounds for real-time factor (processing seconds per audio second) and per-second rates
+RATIO_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+RATE_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0)
+
+HISTOGRAM_BUCKETS = {
+    "session_setup_seconds": LATENCY_BUCKETS,
+    "final_result_latency_seconds": LATENCY_BUCKETS,
+    "interim_results_per_second": RATE_BUCKETS,
+    "real_time_factor": RATIO_BUCKETS,
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "sum": round(self.sum, 6), "count": self.count}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """Thread-safe counters and histograms, written out by an optional exporter"""
+
+    enabled = True
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    def timer(self, source, realtime=False, audio_seconds=None):
+        """Return a RecognitionTimer that records one session into these metrics"""
+        return RecognitionTimer(self, source, realtime, audio_seconds)
+
+    def snapshot(self):
+        """Return {"counters": [...], "histograms": [...]} with one entry per name and label set"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [dict(name=name, labels=dict(labels), **histogram.to_dict())
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+        return {"counters": counters, "histograms": histograms}
+
+    def export(self):
+        if self.exporter is not None:
+            # Sessions finishing together export one after the other, the last snapshot winning
+            with self._export_lock:
+                self.exporter.export(self.snapshot())
+
+
+class NullMetrics:
+    """Metrics that record nothing; sessions skip instrumentation entirely when they get these"""
+
+    enabled = False
+    exporter = None
+
+    def inc(self, name, amount=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def timer(self, source, realtime=False, audio_seconds=None):
+        return None
+
+    def snapshot(self):
+        return {"counters": [], "histograms": []}
+
+    def export(self):
+        pass
+
+
+def _write_atomic(path, text):
+    """Replace path with text so readers never see a partial file"""
+    # A unique temporary file per write, so concurrent exports never rename each other's file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class JsonExporter:
+    """Writes the metrics snapshot as a JSON document"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, snapshot):
+        _write_atomic(self.path, json.dumps(dict(snapshot, exported_at=time.time()), indent=2))
+
+
+class PrometheusTextExporter:
+    """Writes the metrics in the Prometheus text format, e.g. for the node_exporter textfile collector"""
+
+    def __init__(self, path, prefix="speech_"):
+        self.path = path
+        self.prefix = prefix
+
+    @staticmethod
+    def _labels(labels, **extra):
+        labels = dict(labels, **extra)
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+    def export(self, snapshot):
+        lines, typed = [], set()
+        for counter in snapshot["counters"]:
+            name = self.prefix + counter["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{self._labels(counter['labels'])} {counter['value']}")
+        for histogram in snapshot["histograms"]:
+            name = self.prefix + histogram["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in histogram["buckets"].items():
+                lines.append(f"{name}_bucket{self._labels(histogram['labels'], le=bound)} {count}")
+            lines.append(f"{name}_sum{self._labels(histogram['labels'])} {histogram['sum']}")
+            lines.append(f"{name}_count{self._labels(histogram['labels'])} {histogram['count']}")
+        _write_atomic(self.path, "\n".join(lines) + "\n")
+
+
+def metrics_from_env():
+    """Metrics configured by SPEECH_METRICS_FILE (.prom for Prometheus text, otherwise JSON), or NullMetrics"""
+    path = os.getenv('SPEECH_METRICS_FILE')
+    if not path:
+        return NullMetrics()
+    if path.endswith(".prom"):
+        return Metrics(PrometheusTextExporter(path))
+    return Metrics(JsonExporter(path))
+
+
+class RecognitionTimer:
+    """Records the timing of one recognition session into Metrics
+
+    Final-result latency is the time between the end of an utterance on
+    the audio clock (result offset + duration, counted from start()) and
+    the arrival of its final result. It is only meaningful for sources
+    that deliver audio in real time, such as the microphone; files are
+    read faster than real time and are measured by their real-time factor
+    instead.
+    """
+
+    def __init__(self, metrics, source, realtime=False, audio_seconds=None):
+        self.metrics = metrics
+        self.source = source
+        self.realtime = realtime
+        self.audio_seconds = audio_seconds
+        self.started_at = None
+        self.interim_results = 0
+        self.final_results = 0
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.interim_results = 0
+        self.final_results = 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def session_started(self):
+        self.metrics.observe("session_setup_seconds", self.elapsed(), source=self.source)
+
+    def interim(self):
+        self.interim_results += 1
+
+    def final(self, offset, duration):
+        """Record a final result with its offset and duration in 100 ns ticks"""
+        self.final_results += 1
+        if self.realtime:
+            latency = self.elapsed() - (offset + duration) / 10_000_000
+            self.metrics.observe("final_result_latency_seconds", max(0.0, latency), source=self.source)
+
+    def finish(self):
+        """Record per-session totals and export the metrics"""
+        if self.started_at is None:
+            return
+        wall = self.elapsed()
+        self.metrics.inc("sessions_total", source=self.source)
+        self.metrics.inc("interim_results_total", self.interim_results, source=self.source)
+        self.metrics.inc("final_results_total", self.final_results, source=self.source)
+        if wall > 0:
+            self.metrics.observe("interim_results_per_second", self.interim_results / wall, source=self.source)
+        if self.audio_seconds:
+            self.metrics.observe("real_time_factor", wall / self.audio_seconds, source=self.source)
+        self.metrics.export()
@@ -0,0 +1,263 @@
+import os
+import sys
+import time
+import heapq
+import argparse
+import numpy as np
+import soundfile as sf
+import azure.cognitiveservices.speech as speechsdk
+from audio_stream import DEFAULT_CHUNK_FRAMES, DEFAULT_SAMPLE_RATE, _as_write_buffer, as_pcm16, create_push_stream
+from output_sink import OutputEvent
+from speech_diarization import SpeechDiarization
+from transcript import Transcript
+from transcription_session import TranscriptionSession
+
+
+def merge_channel_transcripts(transcripts, labels):
+    """Merge per-channel transcripts onto one timeline, labelling each utterance with its channel
+
+    All channels are captured by the same stream, so their offsets already
+    share a clock and only need interleaving.
+    """
+    merged = Transcript()
+    channels = ([(segment.offset, index, segment) for segment in transcript]
+                for index, transcript in enumerate(transcripts))
+    for _, index, segment in heapq.merge(*channels, key=lambda item: item[:2]):
+        merged.append(labels[index], segment.text, segment.offset, segment.duration)
+    return merged
+
+
+class ChannelDemultiplexer:
+    """Splits interleaved multichannel int16 blocks into one push stream per channel
+
+    Each channel is read through a strided view of the captured block and
+    copied into its row of a reusable contiguous buffer, which is written
+    to the push stream in place. The SDK needs contiguous mono samples, so
+    that one copy is the only one made; no arrays are allocated per block.
+    """
+
+    def __init__(self, streams, channels, blocksize=DEFAULT_CHUNK_FRAMES):
+        self.streams = streams
+        self.channels = list(channels)
+        self._buffer = np.empty((len(self.channels), blocksize), dtype=np.int16)
+
+    def write(self, block):
+        """Write a (frames, device_channels) int16 block to the channel streams"""
+        frames = len(block)
+        if frames > self._buffer.shape[1]:
+            self._buffer = np.empty((len(self.channels), frames), dtype=np.int16)
+        for stream, channel, row in zip(self.streams, self.channels, self._buffer[:, :frames]):
+            np.copyto(row, block[:, channel])
+            stream.write(_as_write_buffer(memoryview(row).cast('B')))
+
+    def close(self):
+        for stream in self.streams:
+            stream.close()
+
+
+class MultiChannelPushSource:
+    """Feeds one multichannel sounddevice input stream into per-channel push streams"""
+
+    def __init__(self, demultiplexer, device_channels, sample_rate=DEFAULT_SAMPLE_RATE, device=None,
+                 blocksize=DEFAULT_CHUNK_FRAMES):
+        # Imported here so file sources work on machines without PortAudio
+        import sounddevice as sd
+
+        self.demultiplexer = demultiplexer
+        self.input_stream = sd.InputStream(
+            samplerate=sample_rate,
+            channels=device_channels,
+            dtype='int16',
+            device=device,
+            blocksize=blocksize,
+            callback=self._callback
+        )
+
+    def _callback(self, indata, frames, time_info, status):
+        self.demultiplexer.write(indata)
+
+    def start(self):
+        self.input_stream.start()
+
+    def stop(self):
+        """Stop capturing and signal end of audio to every channel's recognizer"""
+        self.input_stream.stop()
+        self.input_stream.close()
+        self.demultiplexer.close()
+
+
+class MultiChannelTranscription(SpeechDiarization):
+    """Transcribes each channel of a multichannel source in its own concurrent session
+
+    The channel a voice arrives on identifies the speaker, so every
+    utterance is labelled with its channel's name and the per-channel
+    transcripts are merged on the shared capture timeline.
+    """
+
+    def __init__(self, channels, labels=None, sample_rate=DEFAULT_SAMPLE_RATE, **kwargs):
+        super().__init__(**kwargs)
+        self.channels = list(channels)
+        self.labels = list(labels) if labels else [f"Channel {channel + 1}" for channel in self.channels]
+        if len(self.labels) != len(self.channels):
+            raise ValueError("Give one label per channel")
+        self.sample_rate = sample_rate
+
+    def _channel_callbacks(self, label):
+        """Transcribed and transcribing callbacks that report the channel label as the speaker"""
+        def transcribed(evt):
+            result = evt.result
+            if result.reason == speechsdk.ResultReason.RecognizedSpeech:
+                self.sink.emit(OutputEvent("transcribed", result.text, label, result.offset, result.duration))
+            elif result.reason == speechsdk.ResultReason.NoMatch:
+                self.sink.emit(OutputEvent("nomatch", detail=str(result.no_match_details)))
+
+        def transcribing(evt):
+            self.sink.emit(OutputEvent("transcribing", evt.result.text, label))
+        return transcribed, transcribing
+
+    def _create_channel_session(self, audio_config, label, timer=None):
+        """Create a session for one channel"""
+        conversation_transcriber = self.transcriber_factory(
+            speech_config=self.speech_config,
+            audio_config=audio_config
+        )
+        transcribed, transcribing = self._channel_callbacks(label)
+        conversation_transcriber.transcribed.connect(transcribed)
+        conversation_transcriber.transcribing.connect(transcribing)
+        conversation_transcriber.session_started.connect(self._conversation_transcriber_session_started_cb)
+        conversation_transcriber.session_stopped.connect(self._conversation_transcriber_session_stopped_cb)
+        conversation_transcriber.canceled.connect(self._conversation_transcriber_recognition_canceled_cb)
+        if self.event_log is not None:
+            self.event_log.attach(conversation_transcriber)
+        return TranscriptionSession(conversation_transcriber, timer=timer)
+
+    def _run(self, start_feed, source, realtime=False, audio_seconds=None):
+        """Start one session per channel, run start_feed(demultiplexer) and merge the transcripts
+
+        start_feed returns a function that stops the feed, or None when
+        it has already pushed all audio.
+        """
+        streams, sessions = [], []
+        for label in self.labels:
+            stream, audio_config = create_push_stream(self.sample_rate)
+            timer = self.metrics.timer(source, realtime=realtime, audio_seconds=audio_seconds)
+            streams.append(stream)
+            sessions.append(self._create_channel_session(audio_config, label, timer))
+        for session in sessions:
+            session.start()
+
+        demultiplexer = ChannelDemultiplexer(streams, self.channels)
+        stop = None
+        try:
+            stop = start_feed(demultiplexer)
+            while not all(session.done() for session in sessions):
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print("\nStopping transcription...")
+        finally:
+            # Stop capturing and end every session, also when one channel was canceled or the feed failed
+            if stop:
+                stop()
+            for session in sessions:
+                session.stop()
+        transcripts = [session.wait() for session in sessions]
+        self.sink.flush()
+        self.metrics.export()
+
+        merged = merge_channel_transcripts(transcripts, self.labels)
+        merged.metadata["channels"] = dict(zip(self.labels, self.channels))
+        return merged
+
+    def recognize_from_pcm(self, pcm, sample_rate=None):
+        """Transcribe a (frames, channels) int16 array, one session per selected channel"""
+        pcm = as_pcm16(pcm)
+        if pcm.ndim != 2 or max(self.channels) >= pcm.shape[1]:
+            raise ValueError(f"Audio has {pcm.shape[1] if pcm.ndim == 2 else 1} channels, "
+                             f"channel {max(self.channels)} was requested")
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+        def feed(demultiplexer):
+            # Push the channels block by block, as a live capture would
+            for start in range(0, len(pcm), DEFAULT_CHUNK_FRAMES):
+                demultiplexer.write(pcm[start:start + DEFAULT_CHUNK_FRAMES])
+            demultiplexer.close()
+            return None
+        return self._run(feed, "pcm", audio_seconds=len(pcm) / self.sample_rate)
+
+    def recognize_from_file(self, audio_file_path):
+        """Transcribe each selected channel of a multichannel audio file"""
+        print(f"Starting multichannel transcription of {audio_file_path}")
+        print("=" * 60)
+        pcm, sample_rate = sf.read(audio_file_path, dtype='int16', always_2d=True)
+        transcript = self.recognize_from_pcm(pcm, sample_rate)
+        print(transcript.to_text())
+        return transcript
+
+    def recognize_from_microphone(self, device=None, device_channels=None):
+        """Capture the selected channels of one input device and transcribe them concurrently"""
+        device_channels = device_channels or max(self.channels) + 1
+        print(f"Starting multichannel transcription of {len(self.channels)} channels "
+              f"({', '.join(self.labels)})")
+        print("Press Ctrl+C to stop")
+        print("=" * 60)
+
+        def feed(demultiplexer):
+            source = MultiChannelPushSource(demultiplexer, device_channels, self.sample_rate, device)
+            source.start()
+            return source.stop
+        transcript = self._run(feed, "microphone", realtime=True)
+        print(transcript.to_text())
+        return transcript
+
+
+def parse_args(argv):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Multichannel transcription with one session per channel")
+    parser.add_argument("--file", metavar="PATH", help="Transcribe a multichannel audio file instead of a device")
+    parser.add_argument("--device", help="Input device name or index (see --list-devices)")
+    parser.add_argument("--channels", type=int, nargs="+", default=[0, 1],
+                        help="Zero-based channel numbers to transcribe (default: 0 1)")
+    parser.add_argument("--labels", nargs="+", help="Speaker label for each channel, in the same order")
+    parser.add_argument("--list-devices", action="store_true", help="List audio input devices and exit")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function"""
+    args = parse_args(sys.argv[1:])
+    print("Azure Multichannel Speech Transcription")
+    print("=" * 45)
+
+    if args.list_devices:
+        import sounddevice as sd
+        for index, device in enumerate(sd.query_devices()):
+            if device['max_input_channels'] > 0:
+                print(f"{index}: {device['name']} ({device['max_input_channels']} input channels)")
+        return
+
+    # Check environment variables
+    if not os.getenv('AZURE_SPEECH_KEY'):
+        print("Error: Please set AZURE_SPEECH_KEY in your .env file")
+        print("See env_example.txt for reference")
+        return
+
+    transcription = None
+    try:
+        transcription = MultiChannelTranscription(args.channels, args.labels)
+        if args.file:
+            transcription.recognize_from_file(args.file)
+        else:
+            device = int(args.device) if args.device and args.device.isdigit() else args.device
+            transcription.recognize_from_microphone(device)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        if transcription is not None:
+            transcription.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+
+# Event kinds that are superseded by a later event and may be dropped under load
+INTERIM_KINDS = frozenset(("transcribing", "recognizing"))
+
+POLICIES = ("block", "drop_interim", "drop_newest")
+
+
+class OutputEvent:
+    """A recognizer event captured on the SDK thread for later output
+
+    Only plain values are stored, so formatting and I/O can happen on the
+    writer thread after the SDK callback has returned.
+    """
+
+    __slots__ = ("kind", "text", "speaker_id", "offset", "duration", "detail", "timestamp")
+
+    def __init__(self, kind, text=None, speaker_id=None, offset=None, duration=None, detail=None):
+        self.kind = kind
+        self.text = text
+        self.speaker_id = speaker_id
+        self.offset = offset
+        self.duration = duration
+        self.detail = detail
+        self.timestamp = time.time()
+
+    @property
+    def interim(self):
+        return self.kind in INTERIM_KINDS
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "timestamp": self.timestamp,
+            "text": self.text,
+            "speaker_id": self.speaker_id,
+            "offset": self.offset,
+            "duration": self.duration,
+            "detail": self.detail
+        }
+
+
+class ConsoleWriter:
+    """Writes events to the console using a formatter function
+
+    The formatter returns the exact text to write (including any line
+    ending) or None to skip the event.
+    """
+
+    def __init__(self, formatter, stream=None):
+        self.formatter = formatter
+        self.stream = stream or sys.stdout
+
+    def write(self, event):
+        text = self.formatter(event)
+        if text is not None:
+            self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonlWriter:
+    """Appends one JSON object per event to a file"""
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def write(self, event):
+        self.file.write(json.dumps(event.to_dict()) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CallbackWriter:
+    """Hands each event to a user function on the writer thread"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, event):
+        self.callback(event)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncSink:
+    """Bounded queue between SDK callbacks and a writer running on its own thread
+
+    emit() never performs I/O. When the queue is full the policy decides:
+    'block' waits for room, 'drop_interim' drops interim hypotheses but
+    waits for room for everything else, and 'drop_newest' drops any event.
+    Dropped events are counted in dropped_interim / dropped_final.
+    """
+
+    _STOP = object()
+
+    def __init__(self, writer, max_queue=1000, policy="drop_interim"):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        self.writer = writer
+        self.policy = policy
+        self.dropped_interim = 0
+        self.dropped_final = 0
+        self.written = 0
+        self.write_errors = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._counter_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="output-sink", daemon=True)
+        self._thread.start()
+
+    def emit(self, event):
+        """Queue an event for the writer thread"""
+        if self.policy == "block" or (self.policy == "drop_interim" and not event.interim):
+            self._queue.put(event)
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._counter_lock:
+                if event.interim:
+                    self.dropped_interim += 1
+                else:
+                    self.dropped_final += 1
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                if event is self._STOP:
+                    return
+                try:
+                    self.writer.write(event)
+                    self.written += 1
+                except Exception:
+                    self.write_errors += 1
+                if self._queue.empty():
+                    self.writer.flush()
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued event has been written"""
+        self._queue.join()
+        self.writer.flush()
+
+    def close(self):
+        """Write the remaining events and stop the writer thread"""
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self.writer.close()
+
+    def stats(self):
+        return {
+            "written": self.written,
+            "dropped_interim": self.dropped_interim,
+            "dropped_final": self.dropped_final,
+            "write_errors": self.write_errors,
+            "queued": self._queue.qsize()
+        }
+
+
+class InterimCoalescer:
+    """Thins out interim hypotheses before they reach a sink
+
+    Interim events are passed on at most max_rate times per second per
+    speaker. A hypothesis that arrives sooner is held as that speaker's
+    pending hypothesis, replacing the one held before, and is passed on
+    when the interval expires, so the latest text is always shown. With
+    min_new_words, a hypothesis is only passed on once it gained or lost
+    that many words since the last one shown for the speaker. Every other
+    event goes straight through; a final result discards its speaker's
+    pending hypothesis and resets the speaker, so the first hypothesis of
+    the next utterance is shown immediately.
+    """
+
+    def __init__(self, sink, max_rate=4.0, min_new_words=0):
+        self.sink = sink
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.min_new_words = min_new_words
+        self.coalesced_interim = 0
+        # speaker_id -> (time, word count) of the last interim passed on
+        self._last = {}
+        # speaker_id -> [latest held interim, release time]; one timer per entry passes it on
+        self._pending = {}
+        # Held while emitting, so a delayed hypothesis can never follow its speaker's final result
+        self._lock = threading.Lock()
+
+    def _changed_enough(self, speaker_id, event):
+        last = self._last.get(speaker_id)
+        words = len(event.text.split()) if event.text else 0
+        return last is None or abs(words - last[1]) >= self.min_new_words, words
+
+    def _discard_pending(self, speaker_id):
+        if self._pending.pop(speaker_id, None) is not None:
+            self.coalesced_interim += 1
+
+    def _pass_on(self, event, words):
+        self._last[event.speaker_id] = (time.monotonic(), words)
+        self.sink.emit(event)
+
+    def _release(self, speaker_id, release_at):
+        """Pass on a speaker's held hypothesis once the interval has expired"""
+        with self._lock:
+            pending = self._pending.get(speaker_id)
+            # A timer whose entry was discarded by a final result finds nothing (or a newer entry) and returns
+            if pending is None or pending[1] != release_at:
+                return
+            del self._pending[speaker_id]
+            event = pending[0]
+            changed, words = self._changed_enough(speaker_id, event)
+            if changed:
+                self._pass_on(event, words)
+            else:
+                self.coalesced_interim += 1
+
+    def emit(self, event):
+        speaker_id = event.speaker_id
+        with self._lock:
+            if not event.interim:
+                self._discard_pending(speaker_id)
+                self._last.pop(speaker_id, None)
+                self.sink.emit(event)
+                return
+
+            changed, words = self._changed_enough(speaker_id, event)
+            if not changed:
+                self.coalesced_interim += 1
+                return
+            pending = self._pending.get(speaker_id)
+            if pending is not None:
+                # The release time does not move, so the running timer will pass on the newer event
+                pending[0] = event
+                self.coalesced_interim += 1
+                return
+            last = self._last.get(speaker_id)
+            wait = last[0] + self.min_interval - time.monotonic() if last is not None else 0.0
+            if wait <= 0:
+                self._pass_on(event, words)
+                return
+            release_at = last[0] + self.min_interval
+            self._pending[speaker_id] = [event, release_at]
+            timer = threading.Timer(wait, self._release, (speaker_id, release_at))
+            timer.daemon = True
+            timer.start()
+
+    def flush(self):
+        """Pass on every held hypothesis, then flush the wrapped sink"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for event, _ in pending.values():
+                self._pass_on(event, len(event.text.split()) if event.text else 0)
+        self.sink.flush()
+
+    def close(self):
+        with self._lock:
+            self._pending.clear()
+        self.sink.close()
+
+    def stats(self):
+        stats = self.sink.stats() if hasattr(self.sink, "stats") else {}
+        stats["coalesced_interim"] = self.coalesced_interim
+        return stats
+
+
+def coalesce_interims(sink, max_rate=None, min_new_words=None):
+    """Wrap a sink in an InterimCoalescer when INTERIM_MAX_RATE (updates per second per speaker) is set
+
+    INTERIM_MIN_NEW_WORDS, when set, is how many words a hypothesis must
+    gain or lose before it is shown again; unset, hypotheses are not
+    filtered by word count. With neither set the sink is returned as is.
+    """
+    if max_rate is None:
+        max_rate = float(os.getenv('INTERIM_MAX_RATE', 0))
+    if min_new_words is None:
+        min_new_words = int(os.getenv('INTERIM_MIN_NEW_WORDS', 0))
+    if not max_rate and not min_new_words:
+        return sink
+    return InterimCoalescer(sink, max_rate, min_new_words)
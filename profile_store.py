@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+DEFAULT_PROFILES_DB = "speaker_profiles.db"
+LEGACY_PROFILES_JSON = "speaker_profiles.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    profile_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profiles_name_key ON profiles (name_key);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+"""
+
+
+def _name_key(name):
+    """Normalized form of a speaker name used for case-insensitive lookups"""
+    return name.strip().casefold()
+
+
+class ProfileStore:
+    """SQLite-backed speaker profile store
+
+    Profiles are kept one row per profile with the name indexed for
+    case-insensitive lookup, so adding or deleting a profile touches one
+    row instead of rewriting every profile. The database runs in WAL mode
+    and every write is its own IMMEDIATE transaction, which makes changes
+    atomic and safe when several processes (e.g. voice_registration.py and a
+    running speaker_identification.py) use the same file. A version counter
+    is bumped on every write so readers can detect changes cheaply.
+    """
+
+    def __init__(self, path=None, legacy_json=LEGACY_PROFILES_JSON):
+        self.path = path or os.getenv('SPEAKER_PROFILES_DB', DEFAULT_PROFILES_DB)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if legacy_json and os.path.exists(legacy_json):
+            self.migrate_from_json(legacy_json)
+
+    def _write(self, statements):
+        """Run (sql, params) statements in one transaction and bump the version
+
+        Returns the number of rows the statements changed.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                changed = sum(self._conn.execute(sql, params).rowcount for sql, params in statements)
+                self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+                self._conn.execute("COMMIT")
+                return changed
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _upsert_statement(profile_id, info):
+        return (
+            "INSERT INTO profiles (profile_id, name, name_key, data, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (profile_id) DO UPDATE SET name = excluded.name, name_key = excluded.name_key, "
+            "data = excluded.data, updated_at = excluded.updated_at",
+            (profile_id, info["name"], _name_key(info["name"]), json.dumps(info), time.time())
+        )
+
+    def version(self):
+        """Return a counter that changes whenever any process writes to the store"""
+        return int(self._query("SELECT value FROM meta WHERE key = 'version'")[0][0])
+
+    def get(self, profile_id):
+        """Return a profile's fields, or None if it does not exist"""
+        rows = self._query("SELECT data FROM profiles WHERE profile_id = ?", (profile_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def find_by_name(self, name):
+        """Return the profile ID for a name (case-insensitive), or None"""
+        rows = self._query("SELECT profile_id FROM profiles WHERE name_key = ? LIMIT 1", (_name_key(name),))
+        return rows[0][0] if rows else None
+
+    def all(self):
+        """Return every profile as {profile_id: fields}, in creation order"""
+        rows = self._query("SELECT profile_id, data FROM profiles ORDER BY rowid")
+        return {profile_id: json.loads(data) for profile_id, data in rows}
+
+    def names(self):
+        """Return {profile_id: name} without decoding the full profile data"""
+        return dict(self._query("SELECT profile_id, name FROM profiles"))
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM profiles")[0][0]
+
+    def upsert(self, profile_id, info):
+        """Insert or replace a profile"""
+        self._write([self._upsert_statement(profile_id, info)])
+
+    def update(self, profile_id, **fields):
+        """Merge fields into an existing profile; returns the updated profile or None"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("SELECT data FROM profiles WHERE profile_id = ?", (profile_id,)).fetchall()
+                if not rows:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                info = json.loads(rows[0][0])
+                info.update(fields)
+                sql, params = self._upsert_statement(profile_id, info)
+                self._conn.execute(sql, params)
+                self._conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+                self._conn.execute("COMMIT")
+                return info
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, profile_id):
+        """Delete a profile; returns True if it existed"""
+        return self._write([("DELETE FROM profiles WHERE profile_id = ?", (profile_id,))]) > 0
+
+    def migrate_from_json(self, json_path):
+        """Import profiles from the legacy speaker_profiles.json once
+
+        The import is recorded in the store so later edits are never
+        overwritten by the old file. A file that cannot be read is reported
+        and skipped, and is tried again next time. Returns the number of
+        profiles imported.
+        """
+        migrated = self._query("SELECT value FROM meta WHERE key = 'migrated_json'")
+        if migrated:
+            return 0
+        try:
+            with open(json_path, 'r') as f:
+                profiles = json.load(f)
+            if not isinstance(profiles, dict) or not all(
+                    isinstance(info, dict) and "name" in info for info in profiles.values()):
+                raise ValueError("expected {profile_id: {\"name\": ...}}")
+        except (OSError, ValueError) as e:
+            print(f"Skipping legacy profiles in {json_path}: {e}")
+            return 0
+
+        statements = [self._upsert_statement(profile_id, info) for profile_id, info in profiles.items()]
+        statements.append((
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_json', ?)",
+            (os.path.abspath(json_path),)
+        ))
+        self._write(statements)
+        return len(profiles)
+
+    def close(self):
+        self._conn.close()
+
+
+class ProfileCache:
+    """In-memory view of a ProfileStore that follows changes made by other processes
+
+    A daemon thread polls the store's version counter every interval
+    seconds (one single-row query) and only reloads the profiles when it
+    changed. The new profiles and name lookup are built off to the side
+    and swapped in with one reference assignment, so readers on the
+    recognition callback path never block and always see a complete
+    snapshot.
+    """
+
+    def __init__(self, store, interval=None):
+        self.store = store
+        if interval is None:
+            interval = float(os.getenv('SPEAKER_PROFILES_RELOAD_SECONDS', 2.0))
+        self.interval = interval
+        self._version = None
+        self._snapshot = ({}, {})
+        self._stop = threading.Event()
+        self._thread = None
+        self.refresh()
+
+    @property
+    def profiles(self):
+        """Current {profile_id: fields} snapshot"""
+        return self._snapshot[0]
+
+    @property
+    def names(self):
+        """Current {profile_id: name} snapshot"""
+        return self._snapshot[1]
+
+    def name(self, profile_id, default=None):
+        """Return the profile name for an ID without touching the database"""
+        return self._snapshot[1].get(profile_id, default)
+
+    def refresh(self):
+        """Reload the profiles if the store changed; returns True if a new snapshot was loaded"""
+        version = self.store.version()
+        if version == self._version:
+            return False
+        profiles = self.store.all()
+        self._snapshot = (profiles, {profile_id: info["name"] for profile_id, info in profiles.items()})
+        self._version = version
+        return True
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except sqlite3.Error as e:
+                # Keep serving the last snapshot; the next poll retries
+                print(f"Profile reload failed: {e}")
+
+    def start(self):
+        """Start watching the store in the background"""
+        if self._thread is None and self.interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name="profile-reload", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop watching the store"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
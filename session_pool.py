@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+import azure.cognitiveservices.speech as speechsdk
+
+# Idle connections are recycled before the service is likely to drop them
+DEFAULT_MAX_IDLE_SECONDS = 120
+
+
+def prewarm_enabled(value=None):
+    """Resolve a prewarm option, falling back to the AZURE_SPEECH_PREWARM environment variable"""
+    if value is not None:
+        return value
+    return os.getenv('AZURE_SPEECH_PREWARM', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class _WarmEntry:
+    __slots__ = ("item", "connection", "opened_at", "dropped")
+
+    def __init__(self, item, connection):
+        self.item = item
+        self.connection = connection
+        self.opened_at = time.monotonic()
+        self.dropped = False
+
+
+class WarmPool:
+    """Keeps recognizers with an already open service connection ready for use
+
+    factory() builds a new item (a session or recognizer with its callbacks
+    connected) and recognizer_of(item) returns its SDK recognizer, whose
+    connection is opened with Connection.open before the item is handed
+    out. Connections are opened on a background thread, both when the pool
+    is created and after each acquire(), so neither ever waits for the
+    service. Items that have
+    been idle longer than max_idle_seconds, or whose connection dropped,
+    are replaced instead of returned.
+    """
+
+    def __init__(self, factory, recognizer_of, size=1, continuous=True, max_idle_seconds=DEFAULT_MAX_IDLE_SECONDS):
+        self.factory = factory
+        self.recognizer_of = recognizer_of
+        self.size = size
+        self.continuous = continuous
+        self.max_idle_seconds = max_idle_seconds
+        self.warm_hits = 0
+        self.cold_starts = 0
+        self._ready = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._refilling = False
+        self._start_refill()
+
+    def _open(self):
+        """Build an item and open its connection"""
+        item = self.factory()
+        connection = speechsdk.Connection.from_recognizer(self.recognizer_of(item))
+        entry = _WarmEntry(item, connection)
+
+        def disconnected(evt):
+            entry.dropped = True
+        connection.disconnected.connect(disconnected)
+        connection.open(self.continuous)
+        return entry
+
+    def _refill(self):
+        """Open connections until size items are ready"""
+        while True:
+            with self._lock:
+                if self._closed or len(self._ready) >= self.size:
+                    return
+            try:
+                entry = self._open()
+            except Exception as e:
+                print(f"Could not pre-open a speech connection: {e}")
+                return
+            with self._lock:
+                if self._closed:
+                    entry.connection.close()
+                    return
+                self._ready.append(entry)
+
+    def _refill_in_background(self):
+        try:
+            self._refill()
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def _start_refill(self):
+        """Refill on a background thread unless a refill is already running"""
+        with self._lock:
+            if self._closed or self._refilling:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill_in_background, name="speech-prewarm", daemon=True).start()
+
+    def _fresh(self, entry):
+        return not entry.dropped and time.monotonic() - entry.opened_at < self.max_idle_seconds
+
+    def acquire(self):
+        """Return (item, warm) with a ready item if one is warm, else a new one, and start refilling"""
+        entry = None
+        with self._lock:
+            while self._ready:
+                candidate = self._ready.pop(0)
+                if self._fresh(candidate):
+                    entry = candidate
+                    break
+                candidate.connection.close()
+        if entry is not None:
+            self.warm_hits += 1
+            item = entry.item
+        else:
+            self.cold_starts += 1
+            item = self.factory()
+        self._start_refill()
+        return item, entry is not None
+
+    def close(self):
+        """Close every connection that was never handed out"""
+        with self._lock:
+            self._closed = True
+            entries, self._ready = self._ready, []
+        for entry in entries:
+            entry.connection.close()
@@ -0,0 +1,169 @@
+import os
+from functools import lru_cache
+import numpy as np
+from scipy.fft import dct
+
+N_MFCC = 20
+N_MELS = 40
+FRAME_MS = 25
+HOP_MS = 10
+# Cosine similarity needed before a segment is named after a profile without asking the API. Different
+# voices reach 0.83-0.86 and repeat recordings of one voice about 0.98, so only near-certain matches pass
+DEFAULT_THRESHOLD = 0.95
+# How far the best profile must score above the runner-up; closer calls go to the API
+DEFAULT_MARGIN = 0.05
+
+
+@lru_cache(maxsize=8)
+def mel_filterbank(sample_rate, n_fft, n_mels=N_MELS):
+    """Return an (n_mels, n_fft // 2 + 1) triangular mel filterbank"""
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    edges = to_hz(np.linspace(to_mel(20.0), to_mel(sample_rate / 2), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def mfcc(pcm, sample_rate, n_mfcc=N_MFCC, frame_ms=FRAME_MS, hop_ms=HOP_MS):
+    """Return (n_frames, n_mfcc) MFCCs of int16 mono audio, computed for all frames at once"""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    hop = int(sample_rate * hop_ms / 1000)
+    samples = np.asarray(pcm, dtype=np.float32) / 32768.0
+    if len(samples) < frame_len:
+        return np.zeros((0, n_mfcc), dtype=np.float32)
+    # Pre-emphasis, then overlapping frames as a strided view
+    samples = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+    frames = np.lib.stride_tricks.sliding_window_view(samples, frame_len)[::hop]
+    n_fft = 1 << (frame_len - 1).bit_length()
+    power = np.abs(np.fft.rfft(frames * np.hamming(frame_len).astype(np.float32), n=n_fft, axis=1)) ** 2
+    mel = np.log(power @ mel_filterbank(sample_rate, n_fft).T + 1e-10)
+    return dct(mel, type=2, axis=1, norm='ortho')[:, :n_mfcc].astype(np.float32)
+
+
+def embed(pcm, sample_rate, min_frames=50):
+    """Return a unit-length speaker embedding of int16 mono audio, or None if there is too little speech
+
+    The embedding is the mean and standard deviation of MFCCs 1..n over
+    the louder frames (c0, the frame energy, picks the frames and is then
+    dropped so the embedding does not depend on level).
+    """
+    coefficients = mfcc(pcm, sample_rate)
+    if len(coefficients) < min_frames:
+        return None
+    energy = coefficients[:, 0]
+    voiced = coefficients[energy > np.percentile(energy, 30), 1:]
+    if len(voiced) < min_frames:
+        return None
+    vector = np.concatenate((voiced.mean(axis=0), voiced.std(axis=0)))
+    return vector / (np.linalg.norm(vector) + 1e-10)
+
+
+def merge_embeddings(existing, count, new):
+    """Fold a new embedding into a running average of count earlier ones; returns (embedding, count)"""
+    new = np.asarray(new, dtype=np.float32)
+    if existing is None or not count:
+        return new, 1
+    merged = np.asarray(existing, dtype=np.float32) * count + new
+    return merged / (np.linalg.norm(merged) + 1e-10), count + 1
+
+
+def profile_embedding_fields(embedding, count):
+    """Profile store fields for an embedding"""
+    return {"embedding": [round(float(x), 6) for x in embedding], "embedding_count": count}
+
+
+def update_profile_embedding(store, profile_id, pcm, sample_rate):
+    """Fold the embedding of new enrollment audio into a stored profile; returns False if there was too little speech"""
+    embedding = embed(pcm, sample_rate)
+    if embedding is None:
+        return False
+    info = store.get(profile_id)
+    if info is None:
+        return False
+    merged, count = merge_embeddings(info.get("embedding"), info.get("embedding_count", 0), embedding)
+    store.update(profile_id, **profile_embedding_fields(merged, count))
+    return True
+
+
+class EmbeddingIndex:
+    """Enrolled profile embeddings held in one contiguous float32 matrix
+
+    Each row is unit length, so matching a segment against every profile
+    is a single matrix-vector product giving all cosine similarities.
+    """
+
+    def __init__(self, profile_ids, names, matrix):
+        self.profile_ids = profile_ids
+        self.names = names
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+    @classmethod
+    def from_profiles(cls, profiles):
+        """Build an index from {profile_id: fields}; only Enrolled profiles with an embedding are included"""
+        rows = [(profile_id, info["name"], info["embedding"]) for profile_id, info in profiles.items()
+                if info.get("embedding") and info.get("enrollment_status") == "Enrolled"]
+        if not rows:
+            return cls([], [], np.zeros((0, 2 * (N_MFCC - 1)), dtype=np.float32))
+        profile_ids, names, vectors = zip(*rows)
+        return cls(list(profile_ids), list(names), np.array(vectors, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.profile_ids)
+
+    def scores(self, embedding):
+        """Cosine similarity of an embedding to every profile"""
+        return self.matrix @ np.asarray(embedding, dtype=np.float32)
+
+    def match(self, embedding, threshold=DEFAULT_THRESHOLD, margin=DEFAULT_MARGIN):
+        """Return (profile_id, score) of the closest profile, or (None, score) if the match is not certain
+
+        The best profile must score at least threshold and beat the
+        runner-up by at least margin.
+        """
+        if embedding is None or not len(self):
+            return None, 0.0
+        scores = self.scores(embedding)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        runner_up = float(np.partition(scores, -2)[-2]) if len(scores) > 1 else -1.0
+        if score < threshold or score - runner_up < margin:
+            return None, score
+        return self.profile_ids[best], score
+
+
+class LocalSpeakerMatcher:
+    """Matches audio against the profiles of a ProfileCache without any network call
+
+    The index is rebuilt only when the cache swaps in a new snapshot.
+    LOCAL_MATCH_THRESHOLD and LOCAL_MATCH_MARGIN override the defaults.
+    """
+
+    def __init__(self, profile_cache, threshold=None, margin=None):
+        self.profile_cache = profile_cache
+        if threshold is None:
+            threshold = float(os.getenv('LOCAL_MATCH_THRESHOLD', DEFAULT_THRESHOLD))
+        if margin is None:
+            margin = float(os.getenv('LOCAL_MATCH_MARGIN', DEFAULT_MARGIN))
+        self.threshold = threshold
+        self.margin = margin
+        self._source = None
+        self._index = None
+
+    @property
+    def index(self):
+        profiles = self.profile_cache.profiles
+        if profiles is not self._source:
+            self._index = EmbeddingIndex.from_profiles(profiles)
+            self._source = profiles
+        return self._index
+
+    def identify(self, pcm, sample_rate):
+        """Return (profile_id, score) for a segment, or (None, score) if no profile is close enough"""
+        return self.index.match(embed(pcm, sample_rate), self.threshold, self.margin)
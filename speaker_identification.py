@@ -1,179 +1,172 @@
 import os
+import sys
 import json
-import time
+import argparse
 from datetime import datetime
 from dotenv import load_dotenv
-import azure.cognitiveservices.speech as speechsdk
+from transcription_base import TranscriptionBase
+from profile_store import ProfileCache, ProfileStore
+from output_sink import AsyncSink, JsonlWriter
+from batch_transcription import BatchTranscriber, collect_audio_files
 
 # Load environment variables
 load_dotenv()
 
-class SpeakerIdentification:
-    def __init__(self):
-        # Azure Speech Service configuration
-        self.speech_key = os.getenv('AZURE_SPEECH_KEY')
-        self.speech_region = os.getenv('AZURE_SPEECH_REGION')
-        self.speech_endpoint = os.getenv('AZURE_SPEECH_ENDPOINT')
+class SpeakerIdentification(TranscriptionBase):
+    def __init__(self, sink=None, use_cache=True, prewarm=None, metrics=None, transcriber_factory=None,
+                 event_log=None):
+        super().__init__(sink=sink, use_cache=use_cache, prewarm=prewarm, metrics=metrics,
+                         transcriber_factory=transcriber_factory, event_log=event_log)
         
-        if not self.speech_key:
-            raise ValueError("Azure Speech Key must be set in .env file")
+        # Profiles registered while a session runs are picked up without a restart
+        self.store = ProfileStore()
+        self.profile_cache = ProfileCache(self.store).start()
         
-        self.profiles_file = "speaker_profiles.json"
-        self.profiles = self.load_profiles()
-        
-        # Initialize Azure Speech SDK
-        self._initialize_speech_config()
-        
-    def load_profiles(self):
-        """Load existing speaker profiles from file"""
-        if os.path.exists(self.profiles_file):
-            try:
-                with open(self.profiles_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
+    @property
+    def profiles(self):
+        """Current snapshot of the speaker profiles"""
+        return self.profile_cache.profiles
     
-    def _initialize_speech_config(self):
-        """Initialize Azure Speech SDK configuration for diarization"""
-        # Use endpoint if available, otherwise use region
-        if self.speech_endpoint:
-            self.speech_config = speechsdk.SpeechConfig(
-                subscription=self.speech_key, 
-                endpoint=self.speech_endpoint
-            )
-        elif self.speech_region:
-            self.speech_config = speechsdk.SpeechConfig(
-                subscription=self.speech_key, 
-                region=self.speech_region
-            )
-        else:
-            raise ValueError("Either AZURE_SPEECH_ENDPOINT or AZURE_SPEECH_REGION must be set in .env file")
-        
-        # Configure speech recognition settings for diarization
-        self.speech_config.speech_recognition_language = "en-US"
-        
     def get_speaker_name(self, speaker_id):
         """Get speaker name from profile ID"""
-        if speaker_id in self.profiles:
-            return self.profiles[speaker_id]["name"]
+        name = self.profile_cache.name(speaker_id)
+        if name is not None:
+            return name
         return f"Guest {speaker_id[-4:]}"  # Fallback to guest with last 4 chars
     
+    def name_speakers(self, transcript):
+        """Return a copy of a transcript with speaker IDs replaced by profile names"""
+        return transcript.relabel(self.get_speaker_name)
+    
     def list_profiles(self):
         """List all available speaker profiles"""
-        if not self.profiles:
+        profiles = self.profiles
+        if not profiles:
             print("\n📋 No speaker profiles found.")
             print("💡 Please run voice_registration.py first to create profiles.")
             return
         
-        print(f"\n📋 Available Speaker Profiles ({len(self.profiles)} total):")
+        print(f"\n📋 Available Speaker Profiles ({len(profiles)} total):")
         print("=" * 60)
-        for i, (profile_id, profile_info) in enumerate(self.profiles.items(), 1):
+        for i, (profile_id, profile_info) in enumerate(profiles.items(), 1):
             print(f"{i}. Name: {profile_info['name']}")
             print(f"   Profile ID: {profile_id}")
             print(f"   Created: {profile_info['created_date']}")
             print("-" * 60)
     
-    def _conversation_transcriber_recognition_canceled_cb(self, evt: speechsdk.SessionEventArgs):
-        """Callback for canceled recognition"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f'[{timestamp}] ❌ Canceled event')
-    
-    def _conversation_transcriber_session_stopped_cb(self, evt: speechsdk.SessionEventArgs):
-        """Callback for session stopped"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f'[{timestamp}] 🛑 SessionStopped event')
-    
-    def _conversation_transcriber_transcribed_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
-        """Callback for final transcribed results with speaker identification"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
+    def _format_event(self, event):
+        """Render a queued event as console text; runs on the sink's writer thread"""
+        timestamp = datetime.fromtimestamp(event.timestamp).strftime("%H:%M:%S")
+        if event.kind == "transcribed":
             # Get speaker name from profile if available
-            speaker_id = evt.result.speaker_id
-            speaker_name = self.get_speaker_name(speaker_id)
-            
-            print(f'\n[{timestamp}] ✅ TRANSCRIBED:')
-            print(f'👤 Speaker: {speaker_name}')
-            print(f'💬 Text: {evt.result.text}')
-            print(f'⏱️  Offset: {evt.result.offset}')
-            print(f'⏱️  Duration: {evt.result.duration}')
-            print()
-        elif evt.result.reason == speechsdk.ResultReason.NoMatch:
-            print(f'\n[{timestamp}] ❌ NOMATCH: Speech could not be TRANSCRIBED: {evt.result.no_match_details}')
+            return (f'\n[{timestamp}] ✅ TRANSCRIBED:\n'
+                    f'👤 Speaker: {self.get_speaker_name(event.speaker_id)}\n'
+                    f'💬 Text: {event.text}\n'
+                    f'⏱️  Offset: {event.offset}\n'
+                    f'⏱️  Duration: {event.duration}\n\n')
+        if event.kind == "nomatch":
+            return f'\n[{timestamp}] ❌ NOMATCH: Speech could not be TRANSCRIBED: {event.detail}\n'
+        if event.kind == "transcribing":
+            return (f'[{timestamp}] 🔄 TRANSCRIBING:\n'
+                    f'👤 Speaker: {self.get_speaker_name(event.speaker_id)}\n'
+                    f'💬 Text: {event.text}\n')
+        if event.kind == "session_started":
+            return f'[{timestamp}] 🚀 SessionStarted event\n'
+        if event.kind == "session_stopped":
+            return f'[{timestamp}] 🛑 SessionStopped event\n'
+        if event.kind == "canceled":
+            return f'[{timestamp}] ❌ Canceled event\n'
+        if event.kind == "closing":
+            return f'[{timestamp}] 🛑 CLOSING on {event.detail}\n'
+        return None
     
-    def _conversation_transcriber_transcribing_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
-        """Callback for intermediate transcription results"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        # Get speaker name from profile if available
-        speaker_id = evt.result.speaker_id
-        speaker_name = self.get_speaker_name(speaker_id)
-        
-        print(f'[{timestamp}] 🔄 TRANSCRIBING:')
-        print(f'👤 Speaker: {speaker_name}')
-        print(f'💬 Text: {evt.result.text}')
+    def _say(self, message, icon=""):
+        """Print a status line with its emoji"""
+        print(f"{icon} {message}" if icon else message)
     
-    def _conversation_transcriber_session_started_cb(self, evt: speechsdk.SessionEventArgs):
-        """Callback for session started"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f'[{timestamp}] 🚀 SessionStarted event')
+    def _warn_if_no_profiles(self):
+        """Tell the user that speakers will only get guest names"""
+        if not self.profiles:
+            print("⚠️  No speaker profiles found. Speakers will be identified as 'Guest X'")
+            print("💡 Run voice_registration.py to create speaker profiles for better identification.")
     
-    def transcribe_file(self, audio_file_path):
+    def transcribe_file(self, audio_file_path, skip_silence=False):
         """Perform speech recognition with speaker identification from an audio file"""
         print(f"\n🎵 Starting transcription with speaker identification")
         print(f"📁 File: {audio_file_path}")
         print("=" * 60)
         
-        if not self.profiles:
-            print("⚠️  No speaker profiles found. Speakers will be identified as 'Guest X'")
-            print("💡 Run voice_registration.py to create speaker profiles for better identification.")
+        self._warn_if_no_profiles()
+        return self._transcribe_file(audio_file_path, skip_silence)
+    
+    async def transcribe_file_async(self, audio_file_path):
+        """Perform speech recognition with speaker identification from an audio file as an awaitable"""
+        return await self._transcribe_file_async(audio_file_path)
+    
+    def transcribe_pcm(self, pcm, sample_rate=16000):
+        """Transcribe 16-bit mono PCM held in memory (e.g. a numpy int16 array)"""
+        self._warn_if_no_profiles()
+        return self._transcribe_pcm(pcm, sample_rate)
+    
+    def transcribe_stream(self, fileobj, sample_rate=16000):
+        """Transcribe a binary file-like object holding WAV or raw 16-bit mono PCM"""
+        self._warn_if_no_profiles()
+        return self._transcribe_stream(fileobj, sample_rate)
+    
+    def transcribe_long_file(self, audio_file_path, max_concurrency=4, chunk_seconds=300, skip_silence=False):
+        """Transcribe a long recording as concurrent chunks split at silences"""
+        print(f"\n🎵 Starting chunked transcription with speaker identification")
+        print(f"📁 File: {audio_file_path}")
+        print(f"✂️  Chunks of ~{chunk_seconds}s split at silences, {max_concurrency} concurrent sessions")
+        print("=" * 60)
+        
+        self._warn_if_no_profiles()
+        return self._transcribe_long_file(audio_file_path, max_concurrency, chunk_seconds, skip_silence)
+    
+    def transcribe_batch(self, source, max_concurrency=4, output_file=None):
+        """Transcribe every file in a directory or manifest with a bounded pool of sessions"""
+        paths = collect_audio_files(source)
+        if not paths:
+            print(f"⚠️  No audio files found in '{source}'")
+            return [], None
+        
+        print(f"\n📦 Batch transcription of {len(paths)} files ({max_concurrency} concurrent sessions)")
+        print("=" * 60)
+        
+        output = open(output_file, 'w') if output_file else None
+        
+        def report(batch_result):
+            """Print and persist each file as soon as it completes"""
+            if batch_result.ok:
+                source = "cached" if batch_result.cached else f"{batch_result.elapsed:.1f}s"
+                print(f"✅ {batch_result.path} ({len(batch_result.transcript)} segments, {source})")
+            else:
+                print(f"❌ {batch_result.path}: {batch_result.error}")
+            if output:
+                record = {
+                    "path": batch_result.path,
+                    "ok": batch_result.ok,
+                    "error": None if batch_result.ok else str(batch_result.error),
+                    "elapsed_sec": round(batch_result.elapsed, 3),
+                    "segments": self.name_speakers(batch_result.transcript).to_dicts() if batch_result.ok else []
+                }
+                output.write(json.dumps(record) + "\n")
+                output.flush()
         
         try:
-            # Create audio config from file
-            audio_config = speechsdk.audio.AudioConfig(filename=audio_file_path)
-            
-            # Create conversation transcriber
-            conversation_transcriber = speechsdk.transcription.ConversationTranscriber(
-                speech_config=self.speech_config, 
-                audio_config=audio_config
-            )
-            
-            transcribing_stop = False
-            
-            def stop_cb(evt: speechsdk.SessionEventArgs):
-                """Callback that signals to stop continuous recognition upon receiving an event"""
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                print(f'[{timestamp}] 🛑 CLOSING on {evt}')
-                nonlocal transcribing_stop
-                transcribing_stop = True
-            
-            # Connect callbacks to the events fired by the conversation transcriber
-            conversation_transcriber.transcribed.connect(self._conversation_transcriber_transcribed_cb)
-            conversation_transcriber.transcribing.connect(self._conversation_transcriber_transcribing_cb)
-            conversation_transcriber.session_started.connect(self._conversation_transcriber_session_started_cb)
-            conversation_transcriber.session_stopped.connect(self._conversation_transcriber_session_stopped_cb)
-            conversation_transcriber.canceled.connect(self._conversation_transcriber_recognition_canceled_cb)
-            
-            # Stop transcribing on either session stopped or canceled events
-            conversation_transcriber.session_stopped.connect(stop_cb)
-            conversation_transcriber.canceled.connect(stop_cb)
-            
-            # Start transcribing
-            conversation_transcriber.start_transcribing_async()
-            
-            # Wait for completion
-            while not transcribing_stop:
-                time.sleep(0.5)
-            
-            # Stop transcribing
-            conversation_transcriber.stop_transcribing_async()
-            
-            print("\n✅ Transcription completed!")
-            
-        except Exception as e:
-            print(f"❌ Error during transcription: {e}")
-            raise
+            batch = BatchTranscriber(self.speech_config, max_concurrency=max_concurrency, cache=self.cache,
+                                     transcriber_factory=self.transcriber_factory, metrics=self.metrics)
+            results, summary = batch.transcribe(paths, on_result=report)
+        finally:
+            if output:
+                output.close()
+        
+        print("=" * 60)
+        print(f"📊 Files: {summary.files} ({summary.succeeded} succeeded, {summary.failed} failed, "
+              f"{summary.cached} from cache)")
+        print(f"⏱️  Wall time: {summary.wall_seconds:.1f}s ({summary.files_per_minute:.1f} files/min)")
+        print(f"🎵 Audio transcribed: {summary.audio_seconds:.1f}s ({summary.speedup:.1f}x real time)")
+        return results, summary
     
     def transcribe_microphone(self):
         """Perform real-time speech recognition with speaker identification from microphone"""
@@ -182,56 +175,38 @@ class SpeakerIdentification:
         print("⏹️  Press Ctrl+C to stop")
         print("=" * 60)
         
-        if not self.profiles:
-            print("⚠️  No speaker profiles found. Speakers will be identified as 'Guest X'")
-            print("💡 Run voice_registration.py to create speaker profiles for better identification.")
-        
-        try:
-            # Create audio config using default microphone
-            audio_config = speechsdk.audio.AudioConfig(use_default_microphone=True)
-            
-            # Create conversation transcriber
-            conversation_transcriber = speechsdk.transcription.ConversationTranscriber(
-                speech_config=self.speech_config, 
-                audio_config=audio_config
-            )
-            
-            transcribing_stop = False
-            
-            def stop_cb(evt: speechsdk.SessionEventArgs):
-                """Callback that signals to stop continuous recognition upon receiving an event"""
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                print(f'[{timestamp}] 🛑 CLOSING on {evt}')
-                nonlocal transcribing_stop
-                transcribing_stop = True
-            
-            # Connect callbacks to the events fired by the conversation transcriber
-            conversation_transcriber.transcribed.connect(self._conversation_transcriber_transcribed_cb)
-            conversation_transcriber.transcribing.connect(self._conversation_transcriber_transcribing_cb)
-            conversation_transcriber.session_started.connect(self._conversation_transcriber_session_started_cb)
-            conversation_transcriber.session_stopped.connect(self._conversation_transcriber_session_stopped_cb)
-            conversation_transcriber.canceled.connect(self._conversation_transcriber_recognition_canceled_cb)
-            
-            # Stop transcribing on either session stopped or canceled events
-            conversation_transcriber.session_stopped.connect(stop_cb)
-            conversation_transcriber.canceled.connect(stop_cb)
-            
-            # Start transcribing
-            conversation_transcriber.start_transcribing_async()
-            
-            # Keep the program running until interrupted
-            while not transcribing_stop:
-                time.sleep(0.1)
-                
-        except KeyboardInterrupt:
-            print("\n⏹️  Stopping transcription...")
-            conversation_transcriber.stop_transcribing_async()
-        except Exception as e:
-            print(f"❌ Error during transcription: {e}")
-            raise
+        self._warn_if_no_profiles()
+        self._transcribe_microphone()
+
+def parse_args(argv):
+    """Parse command line options; no options starts the interactive menu"""
+    parser = argparse.ArgumentParser(description="Azure Speaker Identification System")
+    parser.add_argument("--batch", metavar="SOURCE",
+                        help="Transcribe every .wav file in a directory or listed in a manifest file")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('AZURE_SPEECH_MAX_CONCURRENCY', 4)),
+                        help="Maximum number of concurrent transcription sessions (default: 4)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Write per-file batch results to a JSON Lines file")
+    parser.add_argument("--skip-silence", action="store_true",
+                        help="Remove long silences locally before sending file audio to Azure")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always transcribe, ignoring and not updating the transcript cache")
+    parser.add_argument("--prewarm", action="store_true", default=None,
+                        help="Open the service connection ahead of time so live transcription starts faster")
+    parser.add_argument("--event-log", metavar="FILE",
+                        help="Append every recognition event to a binary log that --replay can reprocess")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="Relabel and print the sessions of an event log with the current profiles, then exit")
+    parser.add_argument("--export", metavar="FILE",
+                        help="With --replay, save each session's transcript (.txt, .srt, .json or .jsonl)")
+    parser.add_argument("--events", metavar="FILE",
+                        help="Write recognition events to a JSON Lines file instead of the console")
+    return parser.parse_args(argv)
 
 def main():
     """Main function for speaker identification"""
+    args = parse_args(sys.argv[1:])
+    
     print("🎤 Azure Speaker Identification System")
     print("=" * 45)
     
@@ -246,18 +221,30 @@ def main():
         print("See env_example.txt for reference")
         return
     
+    identification = sink = None
     try:
         # Create speaker identification instance
-        identification = SpeakerIdentification()
+        sink = AsyncSink(JsonlWriter(args.events)) if args.events else None
+        identification = SpeakerIdentification(sink=sink, use_cache=not args.no_cache, prewarm=args.prewarm,
+                                               event_log=args.event_log)
+        
+        if args.replay:
+            identification.replay_log(args.replay, args.export)
+            return
+        
+        if args.batch:
+            identification.transcribe_batch(args.batch, args.concurrency, args.output)
+            return
         
         while True:
             print("\n📋 Choose an option:")
             print("1. List speaker profiles")
             print("2. Transcribe audio file")
             print("3. Real-time transcription (microphone)")
-            print("4. Exit")
+            print("4. Batch transcription (directory or manifest)")
+            print("5. Exit")
             
-            choice = input("\nEnter your choice (1-4): ").strip()
+            choice = input("\nEnter your choice (1-5): ").strip()
             
             if choice == "1":
                 identification.list_profiles()
@@ -267,22 +254,35 @@ def main():
                 if not os.path.exists(audio_file):
                     print(f"❌ Error: File '{audio_file}' not found")
                     continue
-                identification.transcribe_file(audio_file)
+                identification.transcribe_file(audio_file, skip_silence=args.skip_silence)
                 
             elif choice == "3":
                 identification.transcribe_microphone()
                 
             elif choice == "4":
+                source = input("Enter a directory or manifest file: ").strip()
+                if not os.path.exists(source):
+                    print(f"❌ Error: '{source}' not found")
+                    continue
+                identification.transcribe_batch(source, args.concurrency, args.output)
+                
+            elif choice == "5":
                 print("👋 Goodbye!")
                 break
                 
             else:
-                print("❌ Invalid choice. Please enter 1-4.")
+                print("❌ Invalid choice. Please enter 1-5.")
                 
     except KeyboardInterrupt:
         print("\n👋 Interrupted by user")
     except Exception as e:
         print(f"❌ Error: {e}")
+    finally:
+        # Events still queued for --events and the tail of --event-log are written before exit
+        if identification is not None:
+            identification.close()
+        elif sink is not None:
+            sink.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
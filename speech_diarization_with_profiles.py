@@ -1 +1,453 @@
- 
\ No newline at end of file
+import os
+import sys
+import asyncio
+import argparse
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from scipy.signal import resample_poly
+import azure.cognitiveservices.speech as speechsdk
+from speech_diarization import SpeechDiarization
+from chunked_transcription import UNLINKED_SPEAKERS
+from audio_stream import (AudioTape, MicrophonePushSource, WavBody, create_push_stream, read_pcm16, read_wav_header,
+                          write_pcm)
+from voice_activity import remove_silence
+from transcript import TICKS_PER_SECOND
+from transcript_cache import file_cache_key
+from profile_store import ProfileCache, ProfileStore
+from http_client import ApiClient
+from speaker_embedding import LocalSpeakerMatcher
+
+# The identification API takes at most this many candidate profiles per call
+MAX_PROFILES_PER_CALL = 50
+# Returned as the identified profile when no candidate matched
+NO_MATCH_PROFILE_ID = "00000000-0000-0000-0000-000000000000"
+# Live sessions keep this much recent audio for cutting guest clips
+LIVE_AUDIO_SECONDS = 300
+# identifySingleSpeaker only accepts 16 kHz 16-bit mono PCM
+IDENTIFICATION_SAMPLE_RATE = 16000
+
+
+def to_identification_rate(pcm, sample_rate):
+    """Resample int16 mono audio to the rate the identification API expects"""
+    if sample_rate == IDENTIFICATION_SAMPLE_RATE:
+        return pcm
+    divisor = np.gcd(sample_rate, IDENTIFICATION_SAMPLE_RATE)
+    resampled = resample_poly(pcm.astype(np.float32), IDENTIFICATION_SAMPLE_RATE // divisor, sample_rate // divisor)
+    return np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+
+
+def guest_label(speaker_id):
+    """Display label for a diarization ID that is not linked to a profile: Azure's own ID, e.g. Guest-1"""
+    return speaker_id or "Unknown"
+
+
+class SpeakerIdentifier:
+    """Client for the text-independent identifySingleSpeaker call"""
+
+    def __init__(self, http, min_score=0.5):
+        self.http = http
+        self.min_score = min_score
+
+    def identify(self, audio, profile_ids):
+        """Return (profile_id, score) of the best matching profile, or (None, score)
+
+        Candidates beyond MAX_PROFILES_PER_CALL are split over several calls
+        and the best score wins.
+        """
+        best_id, best_score = None, 0.0
+        for start in range(0, len(profile_ids), MAX_PROFILES_PER_CALL):
+            response = self.http.post(
+                "profiles:identifySingleSpeaker",
+                params={"api-version": "2021-09-05",
+                        "profileIds": ",".join(profile_ids[start:start + MAX_PROFILES_PER_CALL])},
+                headers={"Content-Type": "audio/wav; codecs=audio/pcm"},
+                data=audio
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"identification failed ({response.status_code}): {response.text}")
+            identified = response.json().get("identifiedProfile") or {}
+            profile_id = identified.get("profileId")
+            score = identified.get("score", 0.0)
+            if profile_id and profile_id != NO_MATCH_PROFILE_ID and score > best_score:
+                best_id, best_score = profile_id, score
+        if best_score < self.min_score:
+            return None, best_score
+        return best_id, best_score
+
+
+class GuestMapper:
+    """Maps diarization guest IDs to enrolled profiles, identifying each guest once
+
+    observe() runs on the recognizer's callback thread and only records the
+    time span of each utterance. Once a guest has min_speech_seconds of
+    speech, its utterances are cut from the session audio and identified on
+    a worker thread; the result (a profile or no match) is cached for the
+    rest of the session, so every guest costs a single identification.
+    The local embedding matcher is tried first and the remote identifier
+    (if any) is only called when it finds no close profile.
+    """
+
+    def __init__(self, identifier, profile_cache, audio, sample_rate, min_speech_seconds=6.0,
+                 max_speech_seconds=20.0, max_workers=2, local_matcher=None):
+        self.identifier = identifier
+        self.local_matcher = local_matcher
+        self.profile_cache = profile_cache
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.min_speech_seconds = min_speech_seconds
+        self.max_speech_seconds = max_speech_seconds
+        self.names = {}
+        self.identifications = 0
+        self.local_matches = 0
+        self._spans = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="identify")
+        self._futures = []
+
+    def name_for(self, guest_id):
+        """Return the profile name of a guest, or None while unknown"""
+        return self.names.get(guest_id)
+
+    def observe(self, guest_id, offset, duration):
+        """Record an utterance (times in ticks on the session audio) and identify the guest when ready"""
+        if guest_id in UNLINKED_SPEAKERS:
+            return
+        with self._lock:
+            if guest_id in self.names or guest_id in self._pending:
+                return
+            spans = self._spans.setdefault(guest_id, [])
+            spans.append((offset, offset + duration))
+            if sum(end - start for start, end in spans) < self.min_speech_seconds * TICKS_PER_SECOND:
+                return
+            self._submit(guest_id)
+
+    def _submit(self, guest_id):
+        self._pending.add(guest_id)
+        self._futures.append(self._executor.submit(self._identify, guest_id, self._spans.pop(guest_id)))
+
+    def _clip(self, spans):
+        """Concatenate the guest's utterances, up to max_speech_seconds
+
+        Live audio only keeps its most recent minutes, so utterances that
+        have already left it are skipped.
+        """
+        budget = int(self.max_speech_seconds * self.sample_rate)
+        held = getattr(self.audio, "start", 0)
+        pieces = []
+        for start, end in spans:
+            a = max(start * self.sample_rate // TICKS_PER_SECOND, held)
+            b = min(end * self.sample_rate // TICKS_PER_SECOND, a + budget)
+            if b <= a:
+                continue
+            pieces.append(self.audio[a:b])
+            budget -= b - a
+            if budget <= 0:
+                break
+        if not pieces:
+            raise ValueError("none of the guest's speech is still held")
+        return np.concatenate(pieces)
+
+    def _identify(self, guest_id, spans):
+        name = None
+        try:
+            clip = self._clip(spans)
+            profile_id = None
+            if self.local_matcher is not None:
+                try:
+                    profile_id, score = self.local_matcher.identify(clip, self.sample_rate)
+                except Exception as e:
+                    # The API still gets a chance when the local match fails
+                    print(f"Local match failed for {guest_id}: {e}")
+                if profile_id is not None:
+                    with self._lock:
+                        self.local_matches += 1
+                    source = "local"
+            candidates = [candidate for candidate, info in self.profile_cache.profiles.items()
+                          if info.get("enrollment_status") == "Enrolled"]
+            if profile_id is None and self.identifier is not None and candidates:
+                with self._lock:
+                    self.identifications += 1
+                body = WavBody(to_identification_rate(clip, self.sample_rate), IDENTIFICATION_SAMPLE_RATE)
+                profile_id, score = self.identifier.identify(body, candidates)
+                source = "remote"
+            if profile_id is not None:
+                name = self.profile_cache.name(profile_id)
+                print(f"Identified {guest_id} as {name} ({source}, score {score:.2f})")
+        except Exception as e:
+            print(f"Could not identify {guest_id}: {e}")
+        with self._lock:
+            self.names[guest_id] = name
+            self._pending.discard(guest_id)
+
+    def finish(self, min_speech_seconds=4.0):
+        """Identify guests that spoke less than the usual threshold, then wait for every identification"""
+        with self._lock:
+            for guest_id, spans in list(self._spans.items()):
+                if sum(end - start for start, end in spans) >= min_speech_seconds * TICKS_PER_SECOND:
+                    self._submit(guest_id)
+        for future in self._futures:
+            future.result()
+        self._executor.shutdown()
+        return dict(self.names)
+
+    def close(self):
+        """Stop accepting identifications without waiting for running ones"""
+        self._executor.shutdown(wait=False)
+
+
+class SpeechDiarizationWithProfiles(SpeechDiarization):
+    """Azure diarization with guests identified against enrolled speaker profiles"""
+
+    def __init__(self, sink=None, use_cache=True, min_speech_seconds=6.0, offline=False, metrics=None,
+                 transcriber_factory=None, event_log=None):
+        super().__init__(sink=sink, use_cache=use_cache, metrics=metrics, transcriber_factory=transcriber_factory,
+                         event_log=event_log)
+        self.store = ProfileStore()
+        self.profile_cache = ProfileCache(self.store).start()
+        self.min_speech_seconds = min_speech_seconds
+        self.mapper = None
+
+        # Local embeddings name known voices without a network call; the API handles the rest
+        self.local_matcher = LocalSpeakerMatcher(self.profile_cache)
+        self.identifier = None
+        if not offline:
+            api_endpoint = self.speech_endpoint or f"https://{self.speech_region}.api.cognitive.microsoft.com"
+            self.identifier = SpeakerIdentifier(ApiClient(
+                f"{api_endpoint}/speaker-recognition/identification/text-independent",
+                headers={"Ocp-Apim-Subscription-Key": self.speech_key}
+            ))
+
+    def speaker_name(self, speaker_id):
+        """Profile name for a diarization ID once identified, otherwise a guest label"""
+        name = self.mapper.name_for(speaker_id) if self.mapper else None
+        return name or guest_label(speaker_id)
+
+    def _format_event(self, event):
+        """Render a queued event as console text; runs on the sink's writer thread"""
+        timestamp = datetime.fromtimestamp(event.timestamp).strftime("%H:%M:%S")
+        if event.kind == "transcribed":
+            return (f'\n[{timestamp}] TRANSCRIBED:\n'
+                    f'\tText: {event.text}\n'
+                    f'\tSpeaker: {self.speaker_name(event.speaker_id)}\n'
+                    f'\tOffset: {event.offset}\n'
+                    f'\tDuration: {event.duration}\n\n')
+        if event.kind == "transcribing":
+            return f'[{timestamp}] TRANSCRIBING:\n\tText: {event.text}\n\tSpeaker: {self.speaker_name(event.speaker_id)}\n'
+        return super()._format_event(event)
+
+    def _conversation_transcriber_transcribed_cb(self, evt: speechsdk.SpeechRecognitionEventArgs, offset_map=None):
+        """Callback for final transcribed results; also feeds the guest mapper"""
+        result = evt.result
+        if result.reason == speechsdk.ResultReason.RecognizedSpeech and self.mapper is not None:
+            self.mapper.observe(result.speaker_id, result.offset, result.duration)
+        super()._conversation_transcriber_transcribed_cb(evt, offset_map)
+
+    def _identify_settings(self):
+        """Cache settings that change the result: the enrolled profiles and the identification threshold"""
+        enrolled = sorted(profile_id for profile_id, info in self.profile_cache.profiles.items()
+                          if info.get("enrollment_status") == "Enrolled")
+        return {"profiles": enrolled, "min_speech_seconds": self.min_speech_seconds,
+                "min_score": self.identifier.min_score if self.identifier else None,
+                "local_threshold": self.local_matcher.threshold, "local_margin": self.local_matcher.margin}
+
+    def _run(self, audio, sample_rate, start_feed, timer=None):
+        """Transcribe with a guest mapper over audio; start_feed(stream) pushes the audio and returns a stopper"""
+        mapper = self.mapper = GuestMapper(self.identifier, self.profile_cache, audio, sample_rate,
+                                           self.min_speech_seconds, local_matcher=self.local_matcher)
+        try:
+            stream, audio_config = create_push_stream(sample_rate)
+            session = self._create_session(audio_config, timer=timer)
+            session.start()
+            stop = None
+            try:
+                stop = start_feed(stream)
+                while not session.done():
+                    time.sleep(0.1)
+            except KeyboardInterrupt:
+                print("\nStopping transcription...")
+            except Exception:
+                session.stop()
+                raise
+            finally:
+                # Also runs when the session ended on its own (e.g. canceled), so capture never outlives it
+                if stop:
+                    stop()
+            transcript = session.wait()
+            names = mapper.finish()
+            self.sink.flush()
+        finally:
+            # The mapper belongs to this recording only; later sessions must not reuse its names or executor
+            self.mapper = None
+            mapper.close()
+        transcript.metadata["speaker_names"] = {guest: name for guest, name in names.items() if name}
+        transcript.metadata["identifications"] = mapper.identifications
+        transcript.metadata["local_matches"] = mapper.local_matches
+        return transcript
+
+    def name_speakers(self, transcript):
+        """Return a copy of a transcript with identified guests replaced by profile names"""
+        names = transcript.metadata.get("speaker_names", {})
+        return transcript.relabel(lambda speaker: names.get(speaker) or guest_label(speaker))
+
+    def recognize_from_pcm(self, pcm, sample_rate=16000):
+        """Transcribe 16-bit mono PCM and identify each guest once"""
+        def feed(stream):
+            write_pcm(stream, pcm)
+            return None
+        timer = self.metrics.timer("pcm", audio_seconds=len(pcm) / sample_rate)
+        return self.name_speakers(self._run(pcm, sample_rate, feed, timer))
+
+    def recognize_from_stream(self, fileobj, sample_rate=16000):
+        """Transcribe a file-like object holding WAV or raw 16-bit mono PCM and identify each guest once"""
+        limit = None
+        if hasattr(fileobj, "seekable") and fileobj.seekable():
+            position = fileobj.tell()
+            is_wav = fileobj.read(4) == b"RIFF"
+            fileobj.seek(position)
+            if is_wav:
+                sample_rate, channels, limit = read_wav_header(fileobj)
+                if channels != 1:
+                    raise ValueError("Guest identification needs mono audio")
+        data = fileobj.read() if limit is None else fileobj.read(limit)
+        return self.recognize_from_pcm(np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16), sample_rate)
+
+    async def recognize_from_file_async(self, audio_file_path):
+        """Transcribe an audio file with guest identification as an awaitable"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.recognize_from_file, audio_file_path)
+
+    def recognize_from_long_file(self, audio_file_path, max_concurrency=4, chunk_seconds=300, skip_silence=False):
+        """Transcribe a long recording in concurrent chunks; guests are not identified and keep guest labels"""
+        # Chunk sessions have their own timelines, so there is no session audio for a mapper to cut clips from
+        self.mapper = None
+        return super().recognize_from_long_file(audio_file_path, max_concurrency, chunk_seconds, skip_silence)
+
+    def recognize_from_file(self, audio_file_path, skip_silence=False):
+        """Transcribe an audio file and identify each guest once
+
+        The raw transcript and the guest-to-profile mapping are cached
+        together, keyed on the audio and the set of enrolled profiles.
+        With skip_silence, long silences are removed before sending and
+        times are mapped back onto the original recording.
+        """
+        print(f"Starting speech recognition with profile identification from file: {audio_file_path}")
+        print("=" * 60)
+
+        key = None
+        if self.cache is not None:
+            key = file_cache_key(audio_file_path, self.speech_config, skip_silence=skip_silence,
+                                 identify=self._identify_settings())
+            transcript = self.cache.get(key)
+            if transcript is not None:
+                print("Using cached transcript (identical audio, settings and profiles)")
+                named = self.name_speakers(transcript)
+                print(named.to_text())
+                return named
+
+        pcm, sample_rate = read_pcm16(audio_file_path)
+        timer = self.metrics.timer("file", audio_seconds=len(pcm) / sample_rate)
+        filtered = None
+        if skip_silence:
+            filtered = remove_silence(pcm, sample_rate)
+            print(f"Skipping {filtered.skipped_seconds:.1f}s of silence "
+                  f"({filtered.skipped_ratio:.0%} of {filtered.original_seconds:.1f}s)")
+            pcm = filtered.pcm
+
+        def feed(stream):
+            write_pcm(stream, pcm)
+            return None
+        # The guest mapper cuts clips from the audio that was actually sent, so it sees the filtered times
+        transcript = self._run(pcm, sample_rate, feed, timer)
+        if filtered is not None:
+            transcript = filtered.offset_map.map_transcript(transcript)
+            transcript.metadata.update(filtered.report())
+        if key is not None:
+            self.cache.put(key, transcript)
+
+        print(f"\nTranscription completed! {transcript.metadata['local_matches']} speakers matched locally, "
+              f"{transcript.metadata['identifications']} identification calls")
+        return self.name_speakers(transcript)
+
+    def recognize_from_microphone(self, sample_rate=16000):
+        """Transcribe the microphone in real time, identifying each guest once"""
+        print("Starting real-time speech recognition with profile identification from microphone...")
+        print("Press Ctrl+C to stop")
+        print("=" * 60)
+
+        tape = AudioTape(LIVE_AUDIO_SECONDS, sample_rate)
+
+        def feed(stream):
+            source = MicrophonePushSource(stream, sample_rate, tap=tape.append)
+            source.start()
+            return source.stop
+        timer = self.metrics.timer("microphone", realtime=True)
+        return self.name_speakers(self._run(tape, sample_rate, feed, timer))
+
+
+def parse_args(argv):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Azure Speech Diarization with Speaker Profiles")
+    parser.add_argument("--offline", action="store_true",
+                        help="Name speakers with local voice embeddings only, without identification calls")
+    return parser.parse_args(argv)
+
+def main():
+    """Main function"""
+    args = parse_args(sys.argv[1:])
+
+    print("Azure Speech Diarization with Speaker Profiles")
+    print("=" * 45)
+
+    # Check environment variables
+    if not os.getenv('AZURE_SPEECH_KEY'):
+        print("Error: Please set AZURE_SPEECH_KEY in your .env file")
+        print("See env_example.txt for reference")
+        return
+
+    if not os.getenv('AZURE_SPEECH_ENDPOINT') and not os.getenv('AZURE_SPEECH_REGION'):
+        print("Error: Please set either AZURE_SPEECH_ENDPOINT or AZURE_SPEECH_REGION in your .env file")
+        print("See env_example.txt for reference")
+        return
+
+    diarization = None
+    try:
+        diarization = SpeechDiarizationWithProfiles(offline=args.offline)
+        if not diarization.profile_cache.profiles:
+            print("No speaker profiles found; every speaker will be shown as a guest.")
+            print("Run voice_registration.py to enroll speakers.")
+
+        print("\nChoose input method:")
+        print("1. Audio file")
+        print("2. Microphone (real-time)")
+
+        choice = input("Enter your choice (1-2): ").strip()
+
+        if choice == "1":
+            audio_file = input("Enter the path to your audio file: ").strip()
+            if not os.path.exists(audio_file):
+                print(f"Error: File '{audio_file}' not found")
+                return
+            transcript = diarization.recognize_from_file(audio_file)
+            print(transcript.to_text())
+
+        elif choice == "2":
+            transcript = diarization.recognize_from_microphone()
+            print(transcript.to_text())
+
+        else:
+            print("Invalid choice. Please enter 1-2.")
+
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        if diarization is not None:
+            diarization.close()
+
+if __name__ == "__main__":
+    main()
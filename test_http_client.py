@@ -0,0 +1,48 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from http_client import ApiClient
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """Answers the first POST with 429 and Retry-After, every later one with 200"""
+
+    requests_seen = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.requests_seen.append(body)
+        if len(self.requests_seen) == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "2")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        payload = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_post_retries_after_429_with_retry_after():
+    ThrottlingHandler.requests_seen = []
+    server = HTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    delays = []
+    try:
+        with ApiClient(f"http://127.0.0.1:{server.server_port}", timeout=5, max_retries=3,
+                       sleep=delays.append) as client:
+            response = client.post("/identify", data=b"audio")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert ThrottlingHandler.requests_seen == [b"audio", b"audio"]
+    assert delays == [2.0]
@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Azure reports offsets and durations in 100-nanosecond ticks
+TICKS_PER_SECOND = 10_000_000
+
+
+def format_srt_time(ticks):
+    """Format a tick count as an SRT timestamp (HH:MM:SS,mmm)"""
+    total_ms = ticks // 10_000
+    hours, rest = divmod(total_ms, 3_600_000)
+    minutes, rest = divmod(rest, 60_000)
+    seconds, ms = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+class Segment:
+    """A single transcribed utterance"""
+
+    __slots__ = ("speaker", "text", "offset", "duration")
+
+    def __init__(self, speaker, text, offset, duration):
+        self.speaker = speaker
+        self.text = text
+        self.offset = offset
+        self.duration = duration
+
+    @property
+    def start(self):
+        """Start time in seconds"""
+        return self.offset / TICKS_PER_SECOND
+
+    @property
+    def end(self):
+        """End time in seconds"""
+        return (self.offset + self.duration) / TICKS_PER_SECOND
+
+    def to_dict(self):
+        return {
+            "speaker": self.speaker,
+            "text": self.text,
+            "offset": self.offset,
+            "duration": self.duration
+        }
+
+    def __repr__(self):
+        return f"Segment({self.speaker!r}, {self.text!r}, offset={self.offset}, duration={self.duration})"
+
+
+class Transcript:
+    """Time-ordered transcript stored as columns
+
+    Offsets and durations (in ticks) live in typed arrays, speakers are
+    stored once in an interned table and referenced by index, so a
+    transcript costs roughly one string per utterance plus a few bytes of
+    fixed-size columns. Iterating yields Segment objects built on demand.
+    """
+
+    __slots__ = ("_offsets", "_durations", "_speaker_index", "_texts", "speakers", "_speaker_lookup",
+                 "_max_duration", "metadata")
+
+    def __init__(self):
+        self._offsets = array('q')
+        self._durations = array('q')
+        self._speaker_index = array('I')
+        self._texts = []
+        self.speakers = []
+        self._speaker_lookup = {}
+        self._max_duration = 0
+        self.metadata = {}
+
+    def _speaker_slot(self, speaker):
+        """Return the index of a speaker in the speaker table, adding it if new"""
+        index = self._speaker_lookup.get(speaker)
+        if index is None:
+            index = len(self.speakers)
+            self.speakers.append(sys.intern(speaker))
+            self._speaker_lookup[speaker] = index
+        return index
+
+    def append(self, speaker, text, offset, duration):
+        """Add an utterance, keeping the transcript ordered by offset"""
+        speaker_slot = self._speaker_slot(speaker or "")
+        if not self._offsets or offset >= self._offsets[-1]:
+            position = len(self._offsets)
+        else:
+            position = bisect_right(self._offsets, offset)
+        self._offsets.insert(position, offset)
+        self._durations.insert(position, duration)
+        self._speaker_index.insert(position, speaker_slot)
+        self._texts.insert(position, text)
+        self._max_duration = max(self._max_duration, duration)
+
+    def add_result(self, result):
+        """Add a final recognition result from the Speech SDK"""
+        self.append(getattr(result, "speaker_id", "") or "", result.text, result.offset, result.duration)
+
+    def extend(self, segments):
+        """Add every segment from an iterable of Segment objects"""
+        for segment in segments:
+            self.append(segment.speaker, segment.text, segment.offset, segment.duration)
+
+    def _segment(self, i):
+        return Segment(self.speakers[self._speaker_index[i]], self._texts[i], self._offsets[i], self._durations[i])
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        for i in range(len(self._offsets)):
+            yield self._segment(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._take(range(*key.indices(len(self))))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("transcript index out of range")
+        return self._segment(key)
+
+    def _take(self, indices):
+        """Build a new transcript from the given row indices"""
+        subset = Transcript()
+        subset.metadata = dict(self.metadata)
+        for i in indices:
+            subset.append(self.speakers[self._speaker_index[i]], self._texts[i],
+                          self._offsets[i], self._durations[i])
+        return subset
+
+    @property
+    def duration(self):
+        """Seconds from the start of the audio to the end of the last utterance"""
+        if not self._offsets:
+            return 0.0
+        return max(o + d for o, d in zip(self._offsets, self._durations)) / TICKS_PER_SECOND
+
+    def between(self, start, end):
+        """Return the utterances that overlap the [start, end) window, in seconds"""
+        start_ticks = int(start * TICKS_PER_SECOND)
+        end_ticks = int(end * TICKS_PER_SECOND)
+        hi = bisect_left(self._offsets, end_ticks)
+        # Utterances starting before the window may still run into it
+        lo = bisect_left(self._offsets, start_ticks - self._max_duration)
+        return self._take(
+            i for i in range(lo, hi)
+            if self._offsets[i] + self._durations[i] > start_ticks
+        )
+
+    def by_speaker(self, speaker):
+        """Return only the utterances of one speaker"""
+        slot = self._speaker_lookup.get(speaker)
+        return self._take(i for i, s in enumerate(self._speaker_index) if s == slot)
+
+    def relabel(self, name_for):
+        """Return a copy with every speaker label passed through name_for
+
+        Only the speaker table is rewritten, so this is cheap even for long
+        transcripts. Labels that map to the same name are merged.
+        """
+        relabeled = Transcript()
+        relabeled.metadata = dict(self.metadata)
+        remap = array('I', (relabeled._speaker_slot(name_for(speaker)) for speaker in self.speakers))
+        relabeled._offsets = array('q', self._offsets)
+        relabeled._durations = array('q', self._durations)
+        relabeled._speaker_index = array('I', (remap[s] for s in self._speaker_index))
+        relabeled._texts = list(self._texts)
+        relabeled._max_duration = self._max_duration
+        return relabeled
+
+    def map_times(self, mapper):
+        """Return a copy with times rewritten by mapper(starts, ends) -> (starts, ends)
+
+        mapper receives and returns sequences of ticks for all utterances at
+        once, so it can be vectorized. Used to move a transcript from
+        processed audio back onto the original recording's timeline.
+        """
+        starts, ends = mapper(self._offsets, array('q', (o + d for o, d in zip(self._offsets, self._durations))))
+        mapped = Transcript()
+        mapped.metadata = dict(self.metadata)
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            mapped.append(self.speakers[self._speaker_index[i]], self._texts[i], int(start), int(end - start))
+        return mapped
+
+    def to_dicts(self):
+        """Export as a list of plain dictionaries"""
+        return [segment.to_dict() for segment in self]
+
+    def to_json(self):
+        """Export as a JSON document including metadata"""
+        return json.dumps({"metadata": self.metadata, "segments": self.to_dicts()})
+
+    @classmethod
+    def from_json(cls, data):
+        """Rebuild a transcript exported with to_json"""
+        document = json.loads(data)
+        transcript = cls()
+        transcript.metadata = document.get("metadata", {})
+        for segment in document["segments"]:
+            transcript.append(segment["speaker"], segment["text"], segment["offset"], segment["duration"])
+        return transcript
+
+    def write_jsonl(self, f):
+        """Write one JSON object per utterance to an open text file"""
+        for segment in self:
+            f.write(json.dumps(segment.to_dict()) + "\n")
+
+    def to_text(self):
+        """Export as readable 'speaker: text' lines"""
+        return "\n".join(f"[{format_srt_time(s.offset)}] {s.speaker}: {s.text}" for s in self)
+
+    def to_srt(self):
+        """Export as SubRip subtitles with the speaker prefixed to each cue"""
+        cues = []
+        for number, segment in enumerate(self, 1):
+            cues.append(
+                f"{number}\n"
+                f"{format_srt_time(segment.offset)} --> {format_srt_time(segment.offset + segment.duration)}\n"
+                f"{segment.speaker}: {segment.text}\n"
+            )
+        return "\n".join(cues)
+
+    def save(self, path):
+        """Write the transcript to a file, choosing the format by extension (.srt, .json, .jsonl, otherwise text)"""
+        extension = os.path.splitext(path)[1].lower()
+        with open(path, "w", encoding="utf-8") as f:
+            if extension == ".srt":
+                f.write(self.to_srt())
+            elif extension == ".json":
+                f.write(self.to_json())
+            elif extension == ".jsonl":
+                self.write_jsonl(f)
+            else:
+                f.write(self.to_text() + "\n")
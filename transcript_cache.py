@@ -0,0 +1,123 @@
+import os
+import json
+import mmap
+import hashlib
+import tempfile
+from transcript import Transcript
+
+DEFAULT_CACHE_DIR = ".transcript_cache"
+DEFAULT_MAX_MB = 512
+# Bytes hashed per update; the file itself is never read into memory as a whole
+HASH_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def transcription_settings(speech_config, **options):
+    """Collect the settings that change what a transcription returns"""
+    settings = {
+        "language": speech_config.speech_recognition_language,
+        "mode": "conversation_transcription"
+    }
+    settings.update(options)
+    return settings
+
+
+def cache_key(audio_file_path, settings):
+    """Hash the audio content together with the recognition settings
+
+    The file is memory-mapped and hashed in slices of the mapping, so large
+    recordings are never copied into RAM in full.
+    """
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    digest.update(b"\0")
+    with open(audio_file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for start in range(0, size, HASH_CHUNK_BYTES):
+                        digest.update(view[start:start + HASH_CHUNK_BYTES])
+    return digest.hexdigest()
+
+
+def file_cache_key(audio_file_path, speech_config, skip_silence=False, **options):
+    """Cache key for transcribing a file with the given options
+
+    Single-file and batch transcription both build their keys here, so
+    the same audio transcribed the same way is cached once whichever path
+    produced it.
+    """
+    return cache_key(audio_file_path, transcription_settings(speech_config, skip_silence=skip_silence, **options))
+
+
+class TranscriptCache:
+    """Directory of cached transcripts with size-bounded least-recently-used eviction
+
+    Each entry is one JSON file named by its key. Reading an entry bumps its
+    modification time, and writes evict the stalest entries until the
+    directory fits in max_bytes.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.getenv('TRANSCRIPT_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('TRANSCRIPT_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached transcript for a key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                transcript = Transcript.from_json(f.read())
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError):
+            # A damaged entry is treated as a miss and replaced on the next put
+            os.remove(path)
+            return None
+        os.utime(path)
+        return transcript
+
+    def put(self, key, transcript):
+        """Store a transcript atomically and evict old entries if over budget"""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(transcript.to_json())
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove every cached transcript"""
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
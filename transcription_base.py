@@ -0,0 +1,340 @@
+import os
+import functools
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import azure.cognitiveservices.speech as speechsdk
+from transcription_session import TranscriptionSession
+from chunked_transcription import ChunkedTranscriber
+from voice_activity import remove_silence
+from audio_stream import create_push_stream, open_stream_source, read_pcm16, write_pcm
+from transcript_cache import TranscriptCache, file_cache_key
+from session_pool import WarmPool, prewarm_enabled
+from metrics import metrics_from_env
+from event_log import EventLogWriter, replay_event_log
+from output_sink import AsyncSink, coalesce_interims, ConsoleWriter, OutputEvent
+from batch_transcription import audio_duration
+
+# How long a stopped live session may take to deliver its last results and end
+STOP_TIMEOUT_SECONDS = 10
+
+class TranscriptionBase:
+    """Session, cache and output plumbing shared by the diarization and identification front ends
+
+    Subclasses provide _format_event for the console and may override
+    name_speakers to label speakers and _say to decorate status lines.
+    """
+
+    def __init__(self, sink=None, use_cache=True, prewarm=None, metrics=None, transcriber_factory=None,
+                 event_log=None):
+        # Azure Speech Service configuration
+        self.speech_key = os.getenv('AZURE_SPEECH_KEY')
+        self.speech_region = os.getenv('AZURE_SPEECH_REGION')
+        self.speech_endpoint = os.getenv('AZURE_SPEECH_ENDPOINT')
+
+        # Initialize Azure Speech SDK
+        self._initialize_speech_config()
+
+        # Callbacks only queue events; the sink does the formatting and I/O on its own thread.
+        # With INTERIM_MAX_RATE set, interim hypotheses are thinned out before they are queued
+        self.sink = coalesce_interims(sink or AsyncSink(ConsoleWriter(self._format_event)))
+
+        # Transcripts of previously seen audio, keyed by content hash and settings
+        self.use_cache = use_cache
+        self._cache = None
+
+        # Every session's SDK events are appended here so they can be replayed without the audio
+        self.event_log = EventLogWriter(event_log) if event_log else None
+
+        # Session timings (setup, result latency, real-time factor); off unless SPEECH_METRICS_FILE is set
+        self.metrics = metrics or metrics_from_env()
+
+        # Builds each ConversationTranscriber; fake_speech_sdk provides an offline replacement
+        self.transcriber_factory = transcriber_factory or speechsdk.transcription.ConversationTranscriber
+
+        # Optionally keep a microphone session with an open connection ready for the next call
+        self.warm_pool = None
+        if prewarm_enabled(prewarm):
+            self.warm_pool = WarmPool(self._new_microphone_session, lambda session: session.conversation_transcriber)
+
+    def _initialize_speech_config(self):
+        """Initialize Azure Speech SDK configuration for diarization"""
+        if not self.speech_key:
+            raise ValueError("Azure Speech Key must be set in .env file")
+
+        # Use endpoint if available, otherwise use region
+        if self.speech_endpoint:
+            self.speech_config = speechsdk.SpeechConfig(
+                subscription=self.speech_key,
+                endpoint=self.speech_endpoint
+            )
+        elif self.speech_region:
+            self.speech_config = speechsdk.SpeechConfig(
+                subscription=self.speech_key,
+                region=self.speech_region
+            )
+        else:
+            raise ValueError("Either AZURE_SPEECH_ENDPOINT or AZURE_SPEECH_REGION must be set in .env file")
+
+        # Configure speech recognition settings for diarization
+        self.speech_config.speech_recognition_language = "en-US"
+
+    def _say(self, message, icon=""):
+        """Print a status line; subclasses may prefix the icon"""
+        print(message)
+
+    def name_speakers(self, transcript):
+        """Return the transcript with display names for its speakers; raw IDs by default"""
+        return transcript
+
+    def _conversation_transcriber_recognition_canceled_cb(self, evt: speechsdk.SessionEventArgs):
+        """Callback for canceled recognition"""
+        self.sink.emit(OutputEvent("canceled"))
+
+    def _conversation_transcriber_session_stopped_cb(self, evt: speechsdk.SessionEventArgs):
+        """Callback for session stopped"""
+        self.sink.emit(OutputEvent("session_stopped"))
+
+    def _conversation_transcriber_transcribed_cb(self, evt: speechsdk.SpeechRecognitionEventArgs, offset_map=None):
+        """Callback for final transcribed results with speaker identification"""
+        result = evt.result
+        if result.reason == speechsdk.ResultReason.RecognizedSpeech:
+            offset, duration = result.offset, result.duration
+            if offset_map is not None:
+                # Report times on the original recording when silence was skipped
+                offset, duration = offset_map.map_span(offset, duration)
+            self.sink.emit(OutputEvent("transcribed", result.text, result.speaker_id, offset, duration))
+        elif result.reason == speechsdk.ResultReason.NoMatch:
+            self.sink.emit(OutputEvent("nomatch", detail=str(result.no_match_details)))
+
+    def _conversation_transcriber_transcribing_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        """Callback for intermediate transcription results"""
+        self.sink.emit(OutputEvent("transcribing", evt.result.text, evt.result.speaker_id))
+
+    def _conversation_transcriber_session_started_cb(self, evt: speechsdk.SessionEventArgs):
+        """Callback for session started"""
+        self.sink.emit(OutputEvent("session_started"))
+
+    def _conversation_transcriber_closing_cb(self, evt: speechsdk.SessionEventArgs):
+        """Callback that reports the event which ended the session"""
+        self.sink.emit(OutputEvent("closing", detail=str(evt)))
+
+    def _create_session(self, audio_config, offset_map=None, timer=None):
+        """Create a conversation transcriber for the audio source and wrap it in a session"""
+        conversation_transcriber = self.transcriber_factory(
+            speech_config=self.speech_config,
+            audio_config=audio_config
+        )
+
+        # Connect callbacks to the events fired by the conversation transcriber
+        conversation_transcriber.transcribed.connect(
+            functools.partial(self._conversation_transcriber_transcribed_cb, offset_map=offset_map)
+        )
+        conversation_transcriber.transcribing.connect(self._conversation_transcriber_transcribing_cb)
+        conversation_transcriber.session_started.connect(self._conversation_transcriber_session_started_cb)
+        conversation_transcriber.session_stopped.connect(self._conversation_transcriber_session_stopped_cb)
+        conversation_transcriber.canceled.connect(self._conversation_transcriber_recognition_canceled_cb)
+        conversation_transcriber.session_stopped.connect(self._conversation_transcriber_closing_cb)
+        conversation_transcriber.canceled.connect(self._conversation_transcriber_closing_cb)
+
+        if self.event_log is not None:
+            self.event_log.attach(conversation_transcriber, offset_map)
+
+        # The session resolves on either session stopped or canceled events
+        return TranscriptionSession(conversation_transcriber, offset_map, timer)
+
+    def _file_timer(self, audio_file_path):
+        """Metrics timer for a file session, or None when metrics are off"""
+        if not self.metrics.enabled:
+            return None
+        return self.metrics.timer("file", audio_seconds=audio_duration(audio_file_path))
+
+    @property
+    def cache(self):
+        """Transcript cache, created on first use so sessions that never read a file do not touch the disk"""
+        if self._cache is None and self.use_cache:
+            self._cache = TranscriptCache()
+        return self._cache
+
+    def _cached_transcript(self, audio_file_path, **options):
+        """Return (cache_key, cached_transcript) for a file; the key is None when caching is off"""
+        if self.cache is None:
+            return None, None
+        key = file_cache_key(audio_file_path, self.speech_config, **options)
+        transcript = self.cache.get(key)
+        if transcript is not None:
+            self._say("Using cached transcript (identical audio and settings)", "♻️ ")
+            print(self.name_speakers(transcript).to_text())
+        return key, transcript
+
+    def _transcribe_without_silence(self, audio_file_path):
+        """Remove long silences locally, transcribe the rest and report times on the original recording"""
+        pcm, sample_rate = read_pcm16(audio_file_path)
+        filtered = remove_silence(pcm, sample_rate)
+        self._say(f"Skipping {filtered.skipped_seconds:.1f}s of silence "
+                  f"({filtered.skipped_ratio:.0%} of {filtered.original_seconds:.1f}s)", "🔇")
+
+        stream, audio_config = create_push_stream(sample_rate)
+        timer = self.metrics.timer("file", audio_seconds=filtered.original_seconds)
+        transcript = self._transcribe_push_stream(audio_config, lambda: write_pcm(stream, filtered.pcm),
+                                                  filtered.offset_map, timer)
+        transcript.metadata.update(filtered.report())
+        return transcript
+
+    def _transcribe_file(self, audio_file_path, skip_silence=False):
+        """Transcribe a file in one session, reusing a cached transcript when there is one"""
+        try:
+            key, transcript = self._cached_transcript(audio_file_path, skip_silence=skip_silence)
+            if transcript is not None:
+                return self.name_speakers(transcript)
+
+            if skip_silence:
+                transcript = self._transcribe_without_silence(audio_file_path)
+            else:
+                # Create audio config from file
+                audio_config = speechsdk.audio.AudioConfig(filename=audio_file_path)
+                session = self._create_session(audio_config, timer=self._file_timer(audio_file_path))
+
+                # Start transcribing and wait for the session to end
+                session.start()
+                transcript = session.wait()
+                self.sink.flush()
+
+            # Cache raw speaker IDs so later profile changes still apply
+            if key is not None:
+                self.cache.put(key, transcript)
+
+            print()
+            self._say("Transcription completed!", "✅")
+            return self.name_speakers(transcript)
+
+        except Exception as e:
+            self._say(f"Error during transcription: {e}", "❌")
+            raise
+
+    async def _transcribe_file_async(self, audio_file_path):
+        """Transcribe a file in one session as an awaitable"""
+        audio_config = speechsdk.audio.AudioConfig(filename=audio_file_path)
+        session = self._create_session(audio_config, timer=self._file_timer(audio_file_path))
+        session.start()
+        return self.name_speakers(await session.wait_async())
+
+    def _transcribe_push_stream(self, audio_config, feed, offset_map=None, timer=None):
+        """Run a session over a push stream, feeding it from the calling thread"""
+        session = self._create_session(audio_config, offset_map, timer)
+        session.start()
+        try:
+            feed()
+        except Exception:
+            session.stop()
+            raise
+        transcript = session.wait()
+        self.sink.flush()
+        return transcript
+
+    def _transcribe_pcm(self, pcm, sample_rate=16000):
+        """Transcribe 16-bit mono PCM held in memory (e.g. a numpy int16 array)"""
+        stream, audio_config = create_push_stream(sample_rate)
+        timer = self.metrics.timer("pcm", audio_seconds=len(pcm) / sample_rate)
+        transcript = self._transcribe_push_stream(audio_config, lambda: write_pcm(stream, pcm), timer=timer)
+        return self.name_speakers(transcript)
+
+    def _transcribe_stream(self, fileobj, sample_rate=16000):
+        """Transcribe a binary file-like object holding WAV or raw 16-bit mono PCM"""
+        stream, audio_config, feed = open_stream_source(fileobj, sample_rate)
+        transcript = self._transcribe_push_stream(audio_config, feed, timer=self.metrics.timer("stream"))
+        return self.name_speakers(transcript)
+
+    def _transcribe_long_file(self, audio_file_path, max_concurrency=4, chunk_seconds=300, skip_silence=False):
+        """Transcribe a long recording as concurrent chunks split at silences"""
+        try:
+            key, transcript = self._cached_transcript(audio_file_path, chunk_seconds=chunk_seconds,
+                                                      skip_silence=skip_silence)
+            if transcript is not None:
+                return self.name_speakers(transcript)
+
+            chunked = ChunkedTranscriber(self.speech_config, max_concurrency=max_concurrency,
+                                         chunk_seconds=chunk_seconds, skip_silence=skip_silence,
+                                         transcriber_factory=self.transcriber_factory, metrics=self.metrics)
+            transcript = chunked.transcribe_file(audio_file_path)
+            if key is not None:
+                self.cache.put(key, transcript)
+            transcript = self.name_speakers(transcript)
+
+            print(transcript.to_text())
+            print()
+            self._say(f"Transcription completed! {transcript.metadata['chunks']} chunks, "
+                      f"{transcript.metadata['audio_seconds']:.0f}s of audio in "
+                      f"{transcript.metadata['wall_seconds']:.0f}s", "✅")
+            return transcript
+
+        except Exception as e:
+            self._say(f"Error during transcription: {e}", "❌")
+            raise
+
+    def close(self):
+        """Close any pre-opened connection, write out pending output and close the sink and event log"""
+        if self.warm_pool is not None:
+            self.warm_pool.close()
+        self.sink.close()
+        if self.event_log is not None:
+            self.event_log.close()
+
+    def replay_log(self, log_path, export_file=None):
+        """Re-run speaker naming, formatting and export over a recorded event log without sending any audio"""
+        print()
+        self._say(f"Replaying event log: {log_path}", "♻️ ")
+        print("=" * 60)
+
+        transcripts = [self.name_speakers(t) for t in replay_event_log(log_path, self.sink)]
+        self.sink.flush()
+        for number, transcript in enumerate(transcripts, 1):
+            print()
+            self._say(f"Session {number} of {len(transcripts)} ({len(transcript)} utterances)", "📄")
+            print(transcript.to_text())
+            if export_file:
+                base, extension = os.path.splitext(export_file)
+                path = export_file if len(transcripts) == 1 else f"{base}_{number}{extension}"
+                transcript.save(path)
+                self._say(f"Saved to {path}", "💾")
+        return transcripts
+
+    def _new_microphone_session(self):
+        """Create a session that transcribes the default microphone"""
+        return self._create_session(speechsdk.audio.AudioConfig(use_default_microphone=True),
+                                    timer=self.metrics.timer("microphone", realtime=True))
+
+    def _transcribe_microphone(self):
+        """Transcribe the default microphone until the session ends or Ctrl+C is pressed"""
+        try:
+            # Take a pre-opened session when available, otherwise connect now
+            if self.warm_pool:
+                session, warm = self.warm_pool.acquire()
+            else:
+                session, warm = self._new_microphone_session(), False
+
+            # Start transcribing
+            session.start()
+
+            # Keep the program running until interrupted
+            while not session.done():
+                time.sleep(0.1)
+
+        except KeyboardInterrupt:
+            self.sink.flush()
+            print()
+            self._say("Stopping transcription...", "⏹️ ")
+            session.stop()
+            # Export only once the session has ended, so its timings are complete
+            try:
+                session.wait(STOP_TIMEOUT_SECONDS)
+            except FutureTimeoutError:
+                self._say(f"Session did not stop within {STOP_TIMEOUT_SECONDS}s", "⚠️ ")
+            self.sink.flush()
+            self.metrics.export()
+        except Exception as e:
+            self._say(f"Error during transcription: {e}", "❌")
+            raise
+
+        first = session.latency.marks.get("first_transcript")
+        if first is not None:
+            self._say(f"First transcript after {first:.2f}s ({'pre-warmed' if warm else 'cold'} connection)", "⏱️ ")
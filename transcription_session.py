@@ -0,0 +1,129 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+import azure.cognitiveservices.speech as speechsdk
+from transcript import Transcript
+
+
+class LatencyTimer:
+    """Records the seconds from start() to the first occurrence of named events"""
+
+    def __init__(self):
+        self.started_at = None
+        self.marks = {}
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.marks = {}
+
+    def mark(self, name):
+        """Record name the first time it happens after start()"""
+        if self.started_at is not None and name not in self.marks:
+            self.marks[name] = time.monotonic() - self.started_at
+
+    def report(self):
+        return {f"{name}_seconds": round(seconds, 3) for name, seconds in self.marks.items()}
+
+
+class TranscriptionSession:
+    """Runs a ConversationTranscriber and resolves a future when the session ends"""
+
+    def __init__(self, conversation_transcriber, offset_map=None, timer=None):
+        self.conversation_transcriber = conversation_transcriber
+        # Maps offsets back to the original recording when silence was removed before sending
+        self.offset_map = offset_map
+        self.transcript = Transcript()
+        self.future = Future()
+        self._lock = threading.Lock()
+        # Time to the first interim and first final result, stored in the transcript metadata
+        self.latency = LatencyTimer()
+        # Optional metrics.RecognitionTimer; None when metrics are off so callbacks do no extra work
+        self.timer = timer
+
+        # Collect final results and resolve on either session stopped or canceled events
+        conversation_transcriber.transcribing.connect(self._transcribing_cb)
+        conversation_transcriber.transcribed.connect(self._transcribed_cb)
+        conversation_transcriber.session_stopped.connect(self._session_stopped_cb)
+        conversation_transcriber.canceled.connect(self._canceled_cb)
+        if timer is not None:
+            conversation_transcriber.session_started.connect(lambda evt: timer.session_started())
+
+    def _transcribing_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        self.latency.mark("first_result")
+        if self.timer is not None:
+            self.timer.interim()
+
+    def _transcribed_cb(self, evt: speechsdk.SpeechRecognitionEventArgs):
+        """Add every final recognized result to the transcript"""
+        result = evt.result
+        if result.reason == speechsdk.ResultReason.RecognizedSpeech:
+            self.latency.mark("first_result")
+            self.latency.mark("first_transcript")
+            if self.timer is not None:
+                self.timer.final(result.offset, result.duration)
+            if self.offset_map is None:
+                self.transcript.add_result(result)
+            else:
+                offset, duration = self.offset_map.map_span(result.offset, result.duration)
+                self.transcript.append(result.speaker_id, result.text, offset, duration)
+
+    def _session_stopped_cb(self, evt: speechsdk.SessionEventArgs):
+        """Resolve the session once the service has processed all audio"""
+        self._resolve()
+
+    def _canceled_cb(self, evt):
+        """Resolve the session, failing it if the service reported an error"""
+        details = evt.cancellation_details
+        if details.reason == speechsdk.CancellationReason.Error:
+            self._resolve(RuntimeError(f"Transcription canceled: {details.error_details}"))
+        else:
+            self._resolve()
+
+    def _resolve(self, error=None):
+        """Complete the future exactly once, whichever stop event fires first"""
+        with self._lock:
+            if self.future.done():
+                return
+            try:
+                if self.timer is not None:
+                    self.timer.finish()
+            except Exception as e:
+                # Metrics must never keep a session from resolving
+                print(f"Could not record session metrics: {e}")
+            finally:
+                if error is not None:
+                    self.future.set_exception(error)
+                else:
+                    self.transcript.metadata.update(self.latency.report())
+                    self.future.set_result(self.transcript)
+
+    def done(self):
+        """Return True once the session has stopped or was canceled"""
+        return self.future.done()
+
+    def start(self):
+        """Start transcribing and return the completion future"""
+        self.latency.start()
+        if self.timer is not None:
+            self.timer.start()
+        self.conversation_transcriber.start_transcribing_async()
+        return self.future
+
+    def stop(self):
+        """Ask the transcriber to stop; safe to call after the session has ended"""
+        self.conversation_transcriber.stop_transcribing_async()
+
+    def wait(self, timeout=None):
+        """Block until the session ends and return the transcript"""
+        try:
+            return self.future.result(timeout)
+        finally:
+            self.stop()
+
+    async def wait_async(self):
+        """Await the end of the session without tying up a thread"""
+        try:
+            return await asyncio.wrap_future(self.future)
+        finally:
+            self.stop()
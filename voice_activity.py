@@ -0,0 +1,256 @@
+from bisect import bisect_left, bisect_right
+from collections import deque
+import numpy as np
+from transcript import TICKS_PER_SECOND
+
+DEFAULT_FRAME_MS = 30
+# Frames are converted and transformed this many seconds at a time, so memory stays flat for long recordings
+BLOCK_SECONDS = 30
+
+
+def frame_signal(pcm, sample_rate, frame_ms=DEFAULT_FRAME_MS):
+    """Return a (n_frames, frame_len) float32 copy of the audio split into frames"""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(pcm) // frame_len
+    return pcm[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32)
+
+
+def frame_blocks(pcm, sample_rate, frame_ms=DEFAULT_FRAME_MS, block_seconds=BLOCK_SECONDS):
+    """Yield the frames of the audio as float32 arrays of at most block_seconds each"""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    block_len = max(1, int(block_seconds * 1000 / frame_ms)) * frame_len
+    for start in range(0, len(pcm) // frame_len * frame_len, block_len):
+        yield frame_signal(pcm[start:start + block_len], sample_rate, frame_ms)
+
+
+def _energy_db(frames):
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+    return 20 * np.log10(rms + 1e-10)
+
+
+def _flatness(frames):
+    power = np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), axis=1)) ** 2 + 1e-10
+    return np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+
+def _per_frame(pcm, sample_rate, frame_ms, *features):
+    """Compute each feature block by block and return one concatenated array per feature"""
+    results = [[] for _ in features]
+    for frames in frame_blocks(pcm, sample_rate, frame_ms):
+        for result, feature in zip(results, features):
+            result.append(feature(frames))
+    return [np.concatenate(result) if result else np.zeros(0, dtype=np.float32) for result in results]
+
+
+def frame_energy_db(pcm, sample_rate, frame_ms=DEFAULT_FRAME_MS):
+    """Return the RMS level of each frame in dBFS"""
+    return _per_frame(pcm, sample_rate, frame_ms, _energy_db)[0]
+
+
+def spectral_flatness(pcm, sample_rate, frame_ms=DEFAULT_FRAME_MS):
+    """Return the spectral flatness of each frame (near 1 for noise, low for voiced speech)"""
+    return _per_frame(pcm, sample_rate, frame_ms, _flatness)[0]
+
+
+def detect_speech(pcm, sample_rate, frame_ms=DEFAULT_FRAME_MS, margin_db=12.0, min_level_db=-55.0,
+                  max_flatness=0.5, hangover_ms=300):
+    """Return a boolean speech mask with one entry per frame
+
+    A frame counts as speech when its level is margin_db above the noise
+    floor (the 10th percentile of frame levels) and at least min_level_db,
+    and its spectrum is not noise-like. The mask is then widened by
+    hangover_ms on each side so word onsets and tails are not clipped.
+    """
+    # Both features come from one pass over the frames
+    energy, flatness = _per_frame(pcm, sample_rate, frame_ms, _energy_db, _flatness)
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    threshold = max(np.percentile(energy, 10) + margin_db, min_level_db)
+    speech = (energy > threshold) & (flatness < max_flatness)
+
+    hangover = int(hangover_ms / frame_ms)
+    if hangover:
+        speech = np.convolve(speech, np.ones(2 * hangover + 1), mode='same') > 0
+    return speech
+
+
+def speech_seconds(pcm, sample_rate, frame_ms=DEFAULT_FRAME_MS, **kwargs):
+    """Return the number of seconds of detected speech"""
+    return float(np.count_nonzero(detect_speech(pcm, sample_rate, frame_ms, **kwargs))) * frame_ms / 1000
+
+
+def trim_to_speech(pcm, sample_rate, seconds, frame_ms=DEFAULT_FRAME_MS, **kwargs):
+    """Return the leading part of pcm that contains the given number of seconds of speech
+
+    The cut falls at the end of the frame where the running total of
+    speech reaches seconds; audio with less speech is returned whole.
+    Extra keyword arguments go to detect_speech.
+    """
+    kwargs.setdefault("hangover_ms", 0)
+    speech = detect_speech(pcm, sample_rate, frame_ms, **kwargs)
+    needed = int(np.ceil(seconds * 1000 / frame_ms))
+    total = np.cumsum(speech)
+    if not len(total) or total[-1] < needed:
+        return pcm
+    frame_len = int(sample_rate * frame_ms / 1000)
+    return pcm[:(int(np.searchsorted(total, needed)) + 1) * frame_len]
+
+
+class SpeechMeter:
+    """Counts voiced seconds in audio that arrives block by block
+
+    Uses the same level and spectral flatness test as detect_speech, with
+    the noise floor taken from the levels of the most recent history_frames
+    frames. Samples that do not fill a whole frame are carried over to the
+    next block.
+    """
+
+    def __init__(self, sample_rate, frame_ms=DEFAULT_FRAME_MS, margin_db=12.0, min_level_db=-55.0,
+                 max_flatness=0.5, history_frames=1000):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_level_db = min_level_db
+        self.max_flatness = max_flatness
+        self.voiced_frames = 0
+        self._levels = deque(maxlen=history_frames)
+        self._pending = np.zeros(0, dtype=np.int16)
+
+    @property
+    def voiced_seconds(self):
+        return self.voiced_frames * self.frame_ms / 1000
+
+    @property
+    def noise_floor_db(self):
+        """Current noise floor estimate in dBFS, or None before the first frame"""
+        return float(np.percentile(self._levels, 10)) if self._levels else None
+
+    def feed(self, pcm):
+        """Add a block of int16 samples; returns the number of voiced frames in it"""
+        if len(self._pending):
+            pcm = np.concatenate((self._pending, pcm))
+        whole = len(pcm) // self.frame_len * self.frame_len
+        self._pending = pcm[whole:].copy()
+        if not whole:
+            return 0
+        energy = frame_energy_db(pcm[:whole], self.sample_rate, self.frame_ms)
+        self._levels.extend(energy.tolist())
+        threshold = max(np.percentile(self._levels, 10) + self.margin_db, self.min_level_db)
+        voiced = (energy > threshold) & (spectral_flatness(pcm[:whole], self.sample_rate, self.frame_ms)
+                                         < self.max_flatness)
+        count = int(np.count_nonzero(voiced))
+        self.voiced_frames += count
+        return count
+
+
+def _runs(mask):
+    """Return (starts, ends) index arrays of the runs of True in a boolean array"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return edges[0::2], edges[1::2]
+
+
+class OffsetMap:
+    """Maps times in silence-compressed audio back to the original recording
+
+    Holds the start of every kept run in both timelines (in ticks); a time
+    inside run i moves by that run's shift.
+    """
+
+    def __init__(self, compressed_starts, original_starts):
+        self.compressed_starts = list(compressed_starts)
+        self.original_starts = list(original_starts)
+
+    def to_original(self, ticks, end=False):
+        """Map one time; end=True keeps a time on a run boundary in the earlier run"""
+        search = bisect_left if end else bisect_right
+        i = max(search(self.compressed_starts, ticks) - 1, 0)
+        return self.original_starts[i] + ticks - self.compressed_starts[i]
+
+    def map_span(self, offset, duration):
+        """Map an (offset, duration) pair, stretching it over any silence removed inside it"""
+        start = self.to_original(offset)
+        return start, self.to_original(offset + duration, end=True) - start
+
+    def to_original_array(self, ticks, end=False):
+        """Vectorized to_original for an array of times"""
+        ticks = np.asarray(ticks, dtype=np.int64)
+        compressed = np.asarray(self.compressed_starts, dtype=np.int64)
+        original = np.asarray(self.original_starts, dtype=np.int64)
+        i = np.maximum(np.searchsorted(compressed, ticks, side='left' if end else 'right') - 1, 0)
+        return original[i] + ticks - compressed[i]
+
+    def map_transcript(self, transcript):
+        """Return a copy of a transcript moved onto the original timeline"""
+        def mapper(starts, ends):
+            return self.to_original_array(starts), self.to_original_array(ends, end=True)
+        return transcript.map_times(mapper)
+
+
+class FilteredAudio:
+    """Audio with long silences removed, plus what is needed to undo the timing change"""
+
+    def __init__(self, pcm, sample_rate, offset_map, original_samples):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.offset_map = offset_map
+        self.original_seconds = original_samples / sample_rate
+        self.kept_seconds = len(pcm) / sample_rate
+
+    @property
+    def skipped_seconds(self):
+        return self.original_seconds - self.kept_seconds
+
+    @property
+    def skipped_ratio(self):
+        return self.skipped_seconds / self.original_seconds if self.original_seconds else 0.0
+
+    def report(self):
+        return {
+            "original_seconds": round(self.original_seconds, 3),
+            "kept_seconds": round(self.kept_seconds, 3),
+            "skipped_seconds": round(self.skipped_seconds, 3),
+            "skipped_ratio": round(self.skipped_ratio, 4)
+        }
+
+
+def remove_silence(pcm, sample_rate, max_silence_ms=500, frame_ms=DEFAULT_FRAME_MS, **kwargs):
+    """Shorten every silence longer than max_silence_ms to max_silence_ms
+
+    Half of the allowed silence is kept after the preceding speech and half
+    before the following speech, so the recognizer still sees natural
+    pauses between utterances. Extra keyword arguments go to detect_speech.
+    """
+    frame_len = int(sample_rate * frame_ms / 1000)
+    speech = detect_speech(pcm, sample_rate, frame_ms, **kwargs)
+    keep = max(1, int(max_silence_ms / frame_ms) // 2)
+
+    # Drop the middle of each silent run that is longer than the allowance
+    silence_starts, silence_ends = _runs(~speech)
+    long_runs = (silence_ends - silence_starts) > 2 * keep
+    drop = np.zeros(len(speech), dtype=bool)
+    for start, end in zip(silence_starts[long_runs], silence_ends[long_runs]):
+        head = keep if start > 0 else 0
+        tail = keep if end < len(speech) else 0
+        drop[start + head:end - tail] = True
+
+    kept_starts, kept_ends = _runs(~drop)
+    kept_starts = kept_starts * frame_len
+    kept_ends = np.minimum(kept_ends * frame_len, len(pcm))
+    # Samples past the last whole frame always stay
+    if len(kept_ends) and kept_ends[-1] == len(speech) * frame_len:
+        kept_ends[-1] = len(pcm)
+    if len(kept_starts) == 0:
+        kept_starts, kept_ends = np.array([0]), np.array([len(pcm)])
+
+    lengths = kept_ends - kept_starts
+    compressed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    compressed = np.concatenate([pcm[a:b] for a, b in zip(kept_starts, kept_ends)])
+
+    to_ticks = TICKS_PER_SECOND / sample_rate
+    offset_map = OffsetMap(
+        (compressed_starts * to_ticks).astype(np.int64).tolist(),
+        (kept_starts * to_ticks).astype(np.int64).tolist()
+    )
+    return FilteredAudio(compressed, sample_rate, offset_map, len(pcm))
@@ -1,17 +1,32 @@
 import os
+import sys
 import json
+import argparse
 import uuid
 import wave
 import sounddevice as sd
-import soundfile as sf
 import time
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 from datetime import datetime
 from dotenv import load_dotenv
+from profile_store import ProfileStore
+from http_client import ApiClient
+from audio_stream import WavBody, read_pcm16
+from bulk_enrollment import BulkEnroller, collect_enrollments
+from voice_activity import SpeechMeter, trim_to_speech
+from enrollment_quality import check_enrollment_audio
+from speaker_embedding import update_profile_embedding
 
 # Load environment variables
 load_dotenv()
 
+# Extra speech captured on top of what the service asks for, since its speech count can be lower than ours
+SPEECH_MARGIN_SECONDS = 2
+# Speech the text-independent identification API needs before a profile is enrolled, plus the margin
+ENROLLMENT_SPEECH_SECONDS = 20 + SPEECH_MARGIN_SECONDS
+
 class VoiceRegistration:
     def __init__(self):
         # Azure Speaker Recognition API configuration
@@ -30,27 +45,32 @@ class VoiceRegistration:
         else:
             raise ValueError("Either AZURE_SPEECH_ENDPOINT or AZURE_SPEECH_REGION must be set in .env file")
         
-        self.profiles_file = "speaker_profiles.json"
-        self.profiles = self.load_profiles()
-        
-    def load_profiles(self):
-        """Load existing speaker profiles from file"""
-        if os.path.exists(self.profiles_file):
-            try:
-                with open(self.profiles_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-    
-    def save_profiles(self):
-        """Save speaker profiles to file"""
-        with open(self.profiles_file, 'w') as f:
-            json.dump(self.profiles, f, indent=2)
+        # One pooled client for every Speaker Recognition call
+        self.http = ApiClient(
+            f"{self.api_endpoint}/speaker-recognition/identification/text-independent",
+            headers={"Ocp-Apim-Subscription-Key": self.speech_key}
+        )
+        
+        # Profiles live in SQLite; an existing speaker_profiles.json is imported on first use
+        self.store = ProfileStore()
+        
+    @property
+    def profiles(self):
+        """All speaker profiles as {profile_id: fields}"""
+        return self.store.all()
     
-    def record_audio(self, duration=30, sample_rate=16000):
-        """Record audio from microphone for specified duration"""
-        print(f"\n🎤 Recording {duration} seconds of audio...")
+    def record_speech(self, required_speech_sec=ENROLLMENT_SPEECH_SECONDS, max_duration=60, sample_rate=16000,
+                      block_ms=100):
+        """Record until required_speech_sec of voiced audio is captured or max_duration passes
+        
+        Blocks arrive through an InputStream callback into a preallocated
+        buffer; only blocks containing speech (and the block after each one)
+        are kept, so the upload carries little silence. Returns
+        (recording, sample_rate, meter); the SpeechMeter holds the speech
+        and noise measured on the raw input.
+        """
+        print(f"\n🎤 Recording until {required_speech_sec:.0f} seconds of speech are captured "
+              f"(at most {max_duration} seconds)...")
         print("📝 Please read the provided text clearly and naturally.")
         print("⏰ Recording will start in 3 seconds...")
         
@@ -60,37 +80,44 @@ class VoiceRegistration:
         
         print("🎙️  Recording started! Speak now...")
         
-        # Record audio using sounddevice
+        buffer = np.zeros(int(max_duration * sample_rate), dtype=np.int16)
+        length = 0
+        keep_next = False
+        meter = SpeechMeter(sample_rate)
+        done = threading.Event()
+        
+        def callback(indata, frames, time_info, status):
+            """Runs on the audio thread; keeps voiced blocks and signals when there is enough speech"""
+            nonlocal length, keep_next
+            block = indata[:, 0]
+            voiced = meter.feed(block)
+            if voiced or keep_next:
+                count = min(len(block), len(buffer) - length)
+                buffer[length:length + count] = block[:count]
+                length += count
+            keep_next = voiced > 0
+            if meter.voiced_seconds >= required_speech_sec or length >= len(buffer):
+                done.set()
+        
         try:
-            # Record audio
-            recording = sd.rec(int(duration * sample_rate), samplerate=sample_rate, channels=1, dtype='int16')
-            
-            # Show progress while recording
-            for i in range(duration):
-                progress = (i + 1) / duration * 100
-                print(f"\r⏳ Recording progress: {progress:.1f}%", end="", flush=True)
-                time.sleep(1)
-            
-            print("\n✅ Recording completed!")
+            with sd.InputStream(samplerate=sample_rate, channels=1, dtype='int16',
+                                blocksize=int(sample_rate * block_ms / 1000), callback=callback):
+                deadline = time.monotonic() + max_duration
+                while not done.wait(0.5) and time.monotonic() < deadline:
+                    print(f"\r⏳ Speech captured: {meter.voiced_seconds:.1f}s / {required_speech_sec:.0f}s",
+                          end="", flush=True)
             
-            # Wait for recording to finish
-            sd.wait()
+            print(f"\r⏳ Speech captured: {meter.voiced_seconds:.1f}s / {required_speech_sec:.0f}s")
+            if meter.voiced_seconds >= required_speech_sec:
+                print("✅ Recording completed!")
+            else:
+                print("⚠️  Maximum recording time reached before enough speech was captured")
             
-            return recording, sample_rate
+            return buffer[:length], sample_rate, meter
             
         except Exception as e:
             print(f"❌ Error during recording: {e}")
-            return None, sample_rate
-    
-    def save_audio_to_file(self, recording, sample_rate, filename):
-        """Save recorded audio to WAV file"""
-        try:
-            # Save using soundfile
-            sf.write(filename, recording, sample_rate, subtype='PCM_16')
-            return True
-        except Exception as e:
-            print(f"❌ Error saving audio file: {e}")
-            return False
+            return None, sample_rate, meter
     
     def get_enrollment_text(self):
         """Get the text to be read during voice enrollment"""
@@ -120,20 +147,27 @@ Thank you for participating in this voice enrollment session."""
         input("\nPress Enter when you're ready to start recording...")
         
         try:
-            # Record audio
-            recording, sample_rate = self.record_audio(duration=30)
+            # Record until the service's speech requirement is met instead of a fixed 30 seconds
+            recording, sample_rate, meter = self.record_speech()
             
-            if recording is None:
+            if recording is None or not len(recording):
                 print("❌ Recording failed. Please try again.")
                 return None
             
-            # Save to temporary file
-            temp_audio_file = f"temp_enrollment_{name.lower().replace(' ', '_')}.wav"
-            if not self.save_audio_to_file(recording, sample_rate, temp_audio_file):
-                print("❌ Failed to save audio file.")
+            # Catch unusable audio locally before spending API calls on it
+            quality = check_enrollment_audio(recording, sample_rate, speech_seconds=meter.voiced_seconds,
+                                             noise_floor_db=meter.noise_floor_db)
+            for warning in quality.warnings:
+                print(f"⚠️  {warning}")
+            if not quality.ok:
+                print("❌ Recording is not suitable for enrollment:")
+                for problem in quality.problems:
+                    print(f"   - {problem}")
+                print("💡 Please try again in a quieter place, speaking clearly.")
                 return None
             
-            print(f"💾 Audio saved to: {temp_audio_file}")
+            # The WAV container is built around the recording in memory; nothing is written to disk
+            audio = WavBody(recording, sample_rate)
             
             # Create speaker profile using Azure Speaker Recognition API
             print("🔄 Creating speaker profile with Azure...")
@@ -143,33 +177,31 @@ Thank you for participating in this voice enrollment session."""
             
             if not profile_id:
                 print("❌ Failed to create speaker profile")
-                if os.path.exists(temp_audio_file):
-                    os.remove(temp_audio_file)
                 return None
             
             print(f"✅ Speaker profile created with ID: {profile_id}")
             
             # Step 2: Enroll the voice sample
             print("🔄 Enrolling voice sample...")
-            enrollment_result = self.enroll_voice_sample_api(profile_id, temp_audio_file)
+            enrollment_result = self.enroll_voice_sample_api(profile_id, audio)
             
             if enrollment_result:
                 # Save profile info
-                self.profiles[profile_id] = {
+                self.store.upsert(profile_id, {
                     "name": name,
                     "profile_id": profile_id,
                     "created_date": datetime.now().isoformat(),
-                    "audio_file": temp_audio_file,
+                    "audio_file": None,
                     "enrollment_status": enrollment_result.get("enrollmentStatus", "Unknown"),
                     "enrollments_count": enrollment_result.get("enrollmentsCount", 0),
                     "speech_length_sec": enrollment_result.get("enrollmentsSpeechLengthInSec", 0),
                     "remaining_speech_sec": enrollment_result.get("remainingEnrollmentsSpeechLengthInSec", 20)
-                }
-                self.save_profiles()
+                })
+                # Local voice embedding so speakers can be named without a network call
+                update_profile_embedding(self.store, profile_id, recording, sample_rate)
                 
                 print(f"✅ Speaker profile created successfully for {name}")
                 print(f"🆔 Profile ID: {profile_id}")
-                print(f"📁 Audio file: {temp_audio_file}")
                 print(f"📊 Enrollment Status: {enrollment_result.get('enrollmentStatus', 'Unknown')}")
                 print(f"📊 Speech Length: {enrollment_result.get('enrollmentsSpeechLengthInSec', 0):.1f}s")
                 print(f"📊 Remaining: {enrollment_result.get('remainingEnrollmentsSpeechLengthInSec', 20):.1f}s")
@@ -178,66 +210,190 @@ Thank you for participating in this voice enrollment session."""
                     print("🎉 Profile is ready for speaker identification!")
                 else:
                     print("⚠️  Profile needs more enrollment audio to be ready for identification")
+                    print("💡 Use 'Add enrollment audio to a profile' to top it up without starting over.")
                 
                 return profile_id
             else:
                 print("❌ Failed to enroll voice sample")
-                # Clean up temp file
-                if os.path.exists(temp_audio_file):
-                    os.remove(temp_audio_file)
                 return None
                 
         except Exception as e:
             print(f"❌ Error creating speaker profile: {e}")
-            # Clean up temp file
-            if 'temp_audio_file' in locals() and os.path.exists(temp_audio_file):
-                os.remove(temp_audio_file)
             return None
     
     def list_profiles(self):
         """List all available speaker profiles"""
-        if not self.profiles:
+        profiles = self.profiles
+        if not profiles:
             print("\n📋 No speaker profiles found.")
             return
         
-        print(f"\n📋 Available Speaker Profiles ({len(self.profiles)} total):")
+        print(f"\n📋 Available Speaker Profiles ({len(profiles)} total):")
         print("=" * 60)
-        for i, (profile_id, profile_info) in enumerate(self.profiles.items(), 1):
+        for i, (profile_id, profile_info) in enumerate(profiles.items(), 1):
             print(f"{i}. Name: {profile_info['name']}")
             print(f"   Profile ID: {profile_id}")
             print(f"   Created: {profile_info['created_date']}")
-            print(f"   Audio file: {profile_info.get('audio_file', 'N/A')}")
+            print(f"   Status: {profile_info.get('enrollment_status', 'Unknown')} "
+                  f"({profile_info.get('speech_length_sec', 0):.1f}s enrolled, "
+                  f"{profile_info.get('remaining_speech_sec', 0):.1f}s remaining)")
+            print(f"   Audio file: {profile_info.get('audio_file') or 'N/A'}")
             print("-" * 60)
     
+    def _save_enrollment_status(self, profile_id, status, checked_at=None):
+        """Store the enrollment fields of a profile or enrollment response"""
+        fields = {
+            "enrollment_status": status.get("enrollmentStatus", "Unknown"),
+            "enrollments_count": status.get("enrollmentsCount", 0),
+            "speech_length_sec": status.get("enrollmentsSpeechLengthInSec", 0),
+            "remaining_speech_sec": status.get("remainingEnrollmentsSpeechLengthInSec", 0)
+        }
+        if checked_at is not None:
+            fields["status_checked_at"] = checked_at
+        return self.store.update(profile_id, **fields)
+    
+    def refresh_statuses(self, max_concurrency=8, ttl=None, force=False):
+        """Fetch the status of stale profiles concurrently and cache it in the profile store
+        
+        Profiles that are Enrolled and were checked less than ttl seconds ago
+        are skipped; everything else is queried through a bounded pool.
+        Returns (refreshed, skipped, failed) counts.
+        """
+        if ttl is None:
+            ttl = float(os.getenv('PROFILE_STATUS_TTL_SECONDS', 24 * 3600))
+        now = time.time()
+        stale = [
+            profile_id for profile_id, info in self.profiles.items()
+            if force or info.get("enrollment_status") != "Enrolled"
+            or now - info.get("status_checked_at", 0) > ttl
+        ]
+        skipped = len(self.store) - len(stale)
+        if not stale:
+            print(f"✅ All {skipped} profiles are up to date")
+            return 0, skipped, 0
+        
+        print(f"\n🔄 Refreshing status of {len(stale)} profiles ({skipped} cached, {max_concurrency} concurrent)...")
+        refreshed = failed = 0
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            futures = {pool.submit(self.get_profile_status_api, profile_id): profile_id for profile_id in stale}
+            for future in as_completed(futures):
+                status = future.result()
+                if status is None:
+                    failed += 1
+                    continue
+                info = self._save_enrollment_status(futures[future], status, checked_at=time.time())
+                refreshed += 1
+                if info:
+                    print(f"   {info['name']}: {info['enrollment_status']} "
+                          f"({info['remaining_speech_sec']:.1f}s remaining)")
+        
+        print(f"📊 Refreshed {refreshed}, cached {skipped}, failed {failed}")
+        return refreshed, skipped, failed
+    
+    def top_up_profile(self, profile_id, audio_file=None):
+        """Add only the missing enrollment audio to a profile that is not yet Enrolled
+        
+        The remaining speech is read from the service, then recorded live or
+        taken from the start of audio_file, cut once enough speech is in.
+        """
+        profile_info = self.store.get(profile_id)
+        if profile_info is None:
+            print(f"❌ Profile ID {profile_id} not found")
+            return None
+        
+        status = self.get_profile_status_api(profile_id)
+        if status is None:
+            return None
+        self._save_enrollment_status(profile_id, status, checked_at=time.time())
+        remaining = status.get("remainingEnrollmentsSpeechLengthInSec", 0)
+        if status.get("enrollmentStatus") == "Enrolled" or remaining <= 0:
+            print(f"🎉 {profile_info['name']}'s profile is already enrolled; nothing to add.")
+            return status
+        
+        needed = remaining + SPEECH_MARGIN_SECONDS
+        print(f"\n🎤 {profile_info['name']} needs {remaining:.1f}s more speech")
+        
+        if audio_file:
+            pcm, sample_rate = read_pcm16(audio_file)
+            recording = trim_to_speech(pcm, sample_rate, needed)
+            quality = check_enrollment_audio(recording, sample_rate, min_speech_seconds=remaining)
+            print(f"✂️  Uploading {len(recording) / sample_rate:.1f}s of {len(pcm) / sample_rate:.1f}s from {audio_file}")
+        else:
+            recording, sample_rate, meter = self.record_speech(required_speech_sec=needed,
+                                                               max_duration=max(20, int(needed * 3)))
+            if recording is None or not len(recording):
+                print("❌ Recording failed. Please try again.")
+                return None
+            quality = check_enrollment_audio(recording, sample_rate, min_speech_seconds=remaining,
+                                             speech_seconds=meter.voiced_seconds,
+                                             noise_floor_db=meter.noise_floor_db)
+        
+        for warning in quality.warnings:
+            print(f"⚠️  {warning}")
+        if not quality.ok:
+            print("❌ Audio is not suitable for enrollment:")
+            for problem in quality.problems:
+                print(f"   - {problem}")
+            return None
+        
+        enrollment_result = self.enroll_voice_sample_api(profile_id, WavBody(recording, sample_rate))
+        if not enrollment_result:
+            return None
+        self._save_enrollment_status(profile_id, enrollment_result)
+        update_profile_embedding(self.store, profile_id, recording, sample_rate)
+        
+        print(f"📊 Enrollment Status: {enrollment_result.get('enrollmentStatus', 'Unknown')}")
+        print(f"📊 Speech Length: {enrollment_result.get('enrollmentsSpeechLengthInSec', 0):.1f}s")
+        print(f"📊 Remaining: {enrollment_result.get('remainingEnrollmentsSpeechLengthInSec', 0):.1f}s")
+        if enrollment_result.get("enrollmentStatus") == "Enrolled":
+            print("🎉 Profile is ready for speaker identification!")
+        return enrollment_result
+    
+    def build_embeddings(self, force=False):
+        """Compute local voice embeddings for profiles whose enrollment audio is still on disk
+        
+        Profiles enrolled from a live recording already got one at enrollment
+        time; this covers bulk-enrolled and older profiles.
+        """
+        built = missing = 0
+        for profile_id, info in self.profiles.items():
+            if info.get("embedding") and not force:
+                continue
+            files = [path for path in info.get("enrolled_files") or [info.get("audio_file")]
+                     if path and os.path.exists(path)]
+            if not files:
+                missing += 1
+                continue
+            if force:
+                self.store.update(profile_id, embedding=None, embedding_count=0)
+            added = sum(update_profile_embedding(self.store, profile_id, *read_pcm16(path)) for path in files)
+            if added:
+                built += 1
+                print(f"✅ {info['name']}: embedding from {added} file(s)")
+            else:
+                missing += 1
+        print(f"📊 Built {built} embeddings; {missing} profiles have no usable audio on disk")
+        return built
+    
     def delete_profile(self, profile_id):
         """Delete a speaker profile"""
-        if profile_id in self.profiles:
-            name = self.profiles[profile_id]["name"]
-            del self.profiles[profile_id]
-            self.save_profiles()
-            print(f"✅ Deleted profile for {name}")
+        profile_info = self.store.get(profile_id)
+        if profile_info and self.store.delete(profile_id):
+            print(f"✅ Deleted profile for {profile_info['name']}")
         else:
             print(f"❌ Profile ID {profile_id} not found")
     
     def get_profile_by_name(self, name):
         """Get profile ID by name"""
-        for profile_id, profile_info in self.profiles.items():
-            if profile_info["name"].lower() == name.lower():
-                return profile_id
-        return None
+        return self.store.find_by_name(name)
     
     def create_speaker_profile_api(self):
         """Create a new speaker profile using Azure Speaker Recognition API"""
-        url = f"{self.api_endpoint}/speaker-recognition/identification/text-independent/profiles"
         params = {"api-version": "2021-09-05"}
-        headers = {
-            "Ocp-Apim-Subscription-Key": self.speech_key,
-            "Content-Type": "application/json"
-        }
         data = {"locale": "en-us"}
         
         try:
-            response = requests.post(url, params=params, headers=headers, json=data)
+            response = self.http.post("profiles", params=params, json=data)
             
             if response.status_code == 201:
                 profile_info = response.json()
@@ -253,21 +409,19 @@ Thank you for participating in this voice enrollment session."""
             print(f"❌ Error creating speaker profile: {e}")
             return None
     
-    def enroll_voice_sample_api(self, profile_id, audio_file_path):
-        """Enroll a voice sample to an existing speaker profile"""
-        url = f"{self.api_endpoint}/speaker-recognition/identification/text-independent/profiles/{profile_id}/enrollments"
+    def enroll_voice_sample_api(self, profile_id, audio):
+        """Enroll a voice sample (a WAV file path or an in-memory WavBody) to an existing speaker profile"""
         params = {"api-version": "2021-09-05"}
-        headers = {
-            "Ocp-Apim-Subscription-Key": self.speech_key,
-            "Content-Type": "audio/wav; codecs=audio/pcm"
-        }
+        headers = {"Content-Type": "audio/wav; codecs=audio/pcm"}
+        url = f"profiles/{profile_id}/enrollments"
         
         try:
-            # Read the audio file
-            with open(audio_file_path, 'rb') as audio_file:
-                audio_data = audio_file.read()
-            
-            response = requests.post(url, params=params, headers=headers, data=audio_data)
+            if isinstance(audio, WavBody):
+                response = self.http.post(url, params=params, headers=headers, data=audio)
+            else:
+                # The file is streamed and rewound by the client if the upload is retried
+                with open(audio, 'rb') as audio_file:
+                    response = self.http.post(url, params=params, headers=headers, data=audio_file)
             
             if response.status_code == 201:
                 enrollment_info = response.json()
@@ -284,14 +438,10 @@ Thank you for participating in this voice enrollment session."""
     
     def get_profile_status_api(self, profile_id):
         """Get the status of a speaker profile"""
-        url = f"{self.api_endpoint}/speaker-recognition/identification/text-independent/profiles/{profile_id}"
         params = {"api-version": "2021-09-05"}
-        headers = {
-            "Ocp-Apim-Subscription-Key": self.speech_key
-        }
         
         try:
-            response = requests.get(url, params=params, headers=headers)
+            response = self.http.get(f"profiles/{profile_id}", params=params)
             
             if response.status_code == 200:
                 return response.json()
@@ -302,9 +452,77 @@ Thank you for participating in this voice enrollment session."""
         except Exception as e:
             print(f"❌ Error getting profile status: {e}")
             return None
+    
+    def enroll_bulk(self, source, max_concurrency=4, requests_per_second=None, output_file=None, quality_check=True):
+        """Create and enroll profiles for every speaker in a directory or CSV manifest"""
+        speakers = collect_enrollments(source)
+        if not speakers:
+            print(f"⚠️  No enrollment audio found in '{source}'")
+            return []
+        
+        files = sum(len(paths) for paths in speakers.values())
+        print(f"\n📦 Bulk enrollment of {len(speakers)} speakers, {files} files ({max_concurrency} concurrent)")
+        print("=" * 60)
+        
+        output = open(output_file, 'w') if output_file else None
+        
+        def report(result):
+            """Print and persist each speaker as soon as it completes"""
+            if result.ok:
+                print(f"✅ {result.name}: {result.status} ({result.uploaded} uploaded, "
+                      f"{result.skipped} already enrolled, {len(result.rejected)} rejected, {result.elapsed:.1f}s)")
+            else:
+                print(f"❌ {result.name}: {result.error}")
+            for path, problems in result.rejected:
+                print(f"   ⚠️  Skipped {path}: {'; '.join(problems)}")
+            if output:
+                output.write(json.dumps(result.to_dict()) + "\n")
+                output.flush()
+        
+        started = time.monotonic()
+        try:
+            enroller = BulkEnroller(self, max_concurrency=max_concurrency, requests_per_second=requests_per_second,
+                                    quality_check=quality_check)
+            results = enroller.enroll(speakers, on_result=report)
+        finally:
+            if output:
+                output.close()
+        
+        failed = [r for r in results if not r.ok]
+        ready = [r for r in results if r.ok and r.status == "Enrolled"]
+        print("=" * 60)
+        print(f"📊 Speakers: {len(results)} ({len(ready)} enrolled, "
+              f"{len(results) - len(ready) - len(failed)} need more audio, {len(failed)} failed)")
+        print(f"⏱️  Wall time: {time.monotonic() - started:.1f}s")
+        if failed:
+            print("💡 Run the same command again to retry; completed uploads are skipped.")
+        return results
+
+def parse_args(argv):
+    """Parse command line options; no options starts the interactive menu"""
+    parser = argparse.ArgumentParser(description="Azure Voice Registration System")
+    parser.add_argument("--bulk", metavar="SOURCE",
+                        help="Enroll every speaker in a directory (one folder per speaker) or a name,path CSV")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('AZURE_SPEECH_MAX_CONCURRENCY', 4)),
+                        help="Maximum number of concurrent enrollment or status requests (default: 4)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Maximum Speaker Recognition requests per second (default: unlimited)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Write per-speaker results to a JSON Lines file")
+    parser.add_argument("--no-quality-check", action="store_true",
+                        help="Upload every file without the local speech, clipping and noise check")
+    parser.add_argument("--refresh-status", action="store_true",
+                        help="Fetch the enrollment status of stale or not yet enrolled profiles and exit")
+    parser.add_argument("--build-embeddings", action="store_true",
+                        help="Compute local voice embeddings from enrollment audio still on disk and exit")
+    parser.add_argument("--force", action="store_true",
+                        help="Query every profile (--refresh-status) or rebuild every embedding (--build-embeddings)")
+    return parser.parse_args(argv)
 
 def main():
     """Main function for voice registration"""
+    args = parse_args(sys.argv[1:])
+    
     print("🎤 Azure Voice Registration System")
     print("=" * 40)
     
@@ -323,14 +541,29 @@ def main():
         # Create voice registration instance
         registration = VoiceRegistration()
         
+        if args.build_embeddings:
+            registration.build_embeddings(force=args.force)
+            return
+        
+        if args.refresh_status:
+            registration.refresh_statuses(args.concurrency, force=args.force)
+            return
+        
+        if args.bulk:
+            registration.enroll_bulk(args.bulk, args.concurrency, args.rate, args.output,
+                                     quality_check=not args.no_quality_check)
+            return
+        
         while True:
             print("\n📋 Choose an option:")
             print("1. Create new speaker profile")
             print("2. List all speaker profiles")
             print("3. Delete speaker profile")
-            print("4. Exit")
+            print("4. Add enrollment audio to a profile")
+            print("5. Refresh profile status from Azure")
+            print("6. Exit")
             
-            choice = input("\nEnter your choice (1-4): ").strip()
+            choice = input("\nEnter your choice (1-6): ").strip()
             
             if choice == "1":
                 print("\n=== Create New Speaker Profile ===")
@@ -344,6 +577,8 @@ def main():
                 existing_profile = registration.get_profile_by_name(name)
                 if existing_profile:
                     print(f"⚠️  A profile for '{name}' already exists.")
+                    if registration.store.get(existing_profile).get("enrollment_status") != "Enrolled":
+                        print("💡 It is not fully enrolled yet; option 4 adds only the missing audio.")
                     overwrite = input("Do you want to overwrite it? (y/n): ").strip().lower()
                     if overwrite != 'y':
                         continue
@@ -352,7 +587,7 @@ def main():
                 
                 print(f"\n🎤 Voice Registration for: {name}")
                 print("📋 Requirements:")
-                print("- 30 seconds of clear speech")
+                print("- About 20 seconds of clear speech (recording stops automatically)")
                 print("- Read the provided text naturally")
                 print("- Ensure quiet environment")
                 print("- Speak at normal volume")
@@ -369,13 +604,14 @@ def main():
                 
             elif choice == "3":
                 registration.list_profiles()
-                if registration.profiles:
+                profiles = registration.profiles
+                if profiles:
                     try:
                         profile_num = int(input("\nEnter the number of the profile to delete: ").strip())
-                        profile_ids = list(registration.profiles.keys())
+                        profile_ids = list(profiles.keys())
                         if 1 <= profile_num <= len(profile_ids):
                             profile_id = profile_ids[profile_num - 1]
-                            name = registration.profiles[profile_id]["name"]
+                            name = profiles[profile_id]["name"]
                             confirm = input(f"Are you sure you want to delete {name}'s profile? (y/n): ").strip().lower()
                             if confirm == 'y':
                                 registration.delete_profile(profile_id)
@@ -385,11 +621,26 @@ def main():
                         print("❌ Please enter a valid number.")
                 
             elif choice == "4":
+                name = input("Enter speaker name: ").strip()
+                profile_id = registration.get_profile_by_name(name)
+                if not profile_id:
+                    print(f"❌ No profile found for '{name}'")
+                    continue
+                audio_file = input("Audio file to take speech from (leave empty to record): ").strip()
+                if audio_file and not os.path.exists(audio_file):
+                    print(f"❌ Error: File '{audio_file}' not found")
+                    continue
+                registration.top_up_profile(profile_id, audio_file or None)
+                
+            elif choice == "5":
+                registration.refresh_statuses(args.concurrency)
+                
+            elif choice == "6":
                 print("👋 Goodbye!")
                 break
                 
             else:
-                print("❌ Invalid choice. Please enter 1-4.")
+                print("❌ Invalid choice. Please enter 1-6.")
                 
     except KeyboardInterrupt:
         print("\n👋 Interrupted by user")